@@ -4,12 +4,18 @@ Command-line tools for managing sessions and processing recordings
 """
 
 import argparse
+import json
+import os
 import sys
 from typing import Optional
 
 from src.session_manager import SessionManager
 from src.transcription import Transcriber
 from src.summarization import Summarizer
+from src.slides import extract_slides
+from src.segments import export_segments, load_segments
+from src.transcode import transcode_video
+from src.transcript_cache import TranscriptCache
 from src.utils import RecordingType, find_audio_video_files, setup_logging
 from src.config import config
 
@@ -41,6 +47,14 @@ def list_sessions():
             print(f"   💾 Files: {size_str}")
         print()
 
+def session_audio_offset(session_dir: str) -> float:
+    """Audio start relative to the first video frame, from a session's session_info.json (0 if unknown)"""
+    info_file = os.path.join(session_dir, "session_info.json")
+    if not os.path.exists(info_file):
+        return 0.0
+    with open(info_file, 'r', encoding='utf-8') as f:
+        return json.load(f).get('av_sync', {}).get('audio_offset_seconds', 0.0)
+
 def process_existing_recording(audio_file: str, video_file: Optional[str] = None, 
                              recording_type: str = "GoogleMeet", custom_name: Optional[str] = None):
     """Process existing recording files"""
@@ -71,18 +85,80 @@ def process_existing_recording(audio_file: str, video_file: Optional[str] = None
             transcript = f.read()
         summary_file = summarizer.generate_summary(transcript, rec_type)
     
+    # Files taken from an earlier session keep its audio/video offset (read before they are moved)
+    audio_offset = session_audio_offset(os.path.dirname(os.path.abspath(video_file))) if video_file else 0.0
+    
     # Organize files
     organized_files = session_manager.organize_files(
         session_path, audio_file, video_file, transcript_file, summary_file
     )
     
+    # Save timed segments and subtitles next to the transcript
+    if transcriber.last_segments:
+        organized_files.update(export_segments(transcriber.last_segments, session_path, transcriber.last_language))
+    
+    # Extract lesson slides linked to the transcript
+    if organized_files.get('video') and (config.slides.enabled or rec_type == RecordingType.LESSON):
+        slides_file = extract_slides(organized_files['video'], session_path, transcriber.last_segments, audio_offset)
+        if slides_file:
+            organized_files['slides'] = slides_file
+    
     # Create session info
-    session_manager.create_session_info(session_path, rec_type, custom_name, organized_files)
+    metadata = {'av_sync': {'audio_offset_seconds': audio_offset}} if audio_offset else None
+    session_manager.create_session_info(session_path, rec_type, custom_name, organized_files, metadata)
     
     # Print summary
     session_manager.print_session_summary(session_path)
     print("\n✅ Processing completed!")
 
+def extract_session_slides(session_name: str):
+    """Extract slides from the video of an existing session, linked to its saved transcript segments"""
+    session_manager = SessionManager()
+    target_session = next((s for s in session_manager.list_sessions() if s['name'] == session_name), None)
+    if not target_session:
+        print(f"❌ Session not found: {session_name}")
+        return
+    
+    video_name = target_session['info'].get('files', {}).get('video')
+    if not video_name:
+        print(f"❌ Session has no video: {session_name}")
+        return
+    
+    slides_file = extract_slides(os.path.join(target_session['path'], video_name), target_session['path'],
+                                 load_segments(target_session['path']), session_audio_offset(target_session['path']))
+    if not slides_file:
+        print("❌ No slides extracted")
+        return
+    
+    info = target_session['info']
+    info['files']['slides'] = os.path.basename(slides_file)
+    with open(os.path.join(target_session['path'], "session_info.json"), 'w', encoding='utf-8') as f:
+        json.dump(info, f, indent=2, ensure_ascii=False)
+    print(f"✅ Slides saved: {slides_file}")
+
+def transcode_recording(video_file: str, output_file: Optional[str] = None, workers: Optional[int] = None,
+                        encoder: str = "ffmpeg"):
+    """Transcode a recording to compact MP4 across all cores"""
+    stats = transcode_video(video_file, output_file, workers=workers, encoder=encoder)
+    if not stats:
+        print("❌ Transcoding failed")
+        return
+    
+    report = stats.to_dict()
+    print(f"✅ Transcoded {report['media_seconds']:.0f}s of video in {report['wall_seconds']:.1f}s "
+          f"({report['speed']}x real time, {report['fps']} fps, {report['workers']} workers)")
+    print(f"   💾 {report['input_mb']}MB -> {report['output_mb']}MB ({report['size_ratio'] * 100:.0f}%)")
+
+def show_transcript_cache(clear: bool = False):
+    """Show or clear the cached Whisper transcripts"""
+    cache = TranscriptCache()
+    if clear:
+        cache.clear()
+        print("🗑️ Transcript cache cleared")
+    stats = cache.get_stats()
+    print(f"📦 Transcript cache: {stats['entries']} transcripts, {stats['size_mb']}MB of {stats['max_mb']}MB")
+    print(f"   📁 {stats['path']}")
+
 def delete_session(session_name: str):
     """Delete a recording session"""
     session_manager = SessionManager()
@@ -133,6 +209,22 @@ def main():
     delete_parser = subparsers.add_parser('delete', help='Delete a recording session')
     delete_parser.add_argument('session_name', help='Name of the session to delete')
     
+    # Slides command
+    slides_parser = subparsers.add_parser('slides', help='Extract slides from a session video')
+    slides_parser.add_argument('session_name', help='Name of the session')
+    
+    # Transcode command
+    transcode_parser = subparsers.add_parser('transcode', help='Transcode a recording to MP4 in parallel')
+    transcode_parser.add_argument('video_file', help='Video file path')
+    transcode_parser.add_argument('--output', help='Output file (default: input name with .mp4)')
+    transcode_parser.add_argument('--workers', type=int, help='Parallel encoders (default: CPU count)')
+    transcode_parser.add_argument('--encoder', choices=['ffmpeg', 'opencv'], default='ffmpeg',
+                                  help='Segment encoder')
+    
+    # Transcript cache command
+    cache_parser = subparsers.add_parser('cache', help='Show or clear cached transcripts')
+    cache_parser.add_argument('--clear', action='store_true', help='Delete all cached transcripts')
+    
     # Auto-process command
     auto_parser = subparsers.add_parser('auto', help='Auto-process files in current directory')
     auto_parser.add_argument('--type', choices=[rt.value for rt in RecordingType], 
@@ -150,10 +242,19 @@ def main():
     elif args.command == 'delete':
         delete_session(args.session_name)
         
+    elif args.command == 'slides':
+        extract_session_slides(args.session_name)
+        
+    elif args.command == 'transcode':
+        transcode_recording(args.video_file, args.output, args.workers, args.encoder)
+        
+    elif args.command == 'cache':
+        show_transcript_cache(args.clear)
+        
     elif args.command == 'auto':
         audio_file, video_file = find_audio_video_files()
         if not audio_file:
-            print("❌ No audio files found (.wav, .mp3)")
+            print("❌ No audio files found (.wav, .mp3, .flac, .opus)")
             return
         
         print(f"📁 Found audio: {audio_file}")
@@ -4,14 +4,19 @@ Refactored Dual Audio Recording Bot
 Modular implementation with improved structure and maintainability
 """
 
+import os
 import time
 from typing import Optional, Tuple
 
 from src.audio_processing import AudioRecorder
 from src.video_processing import VideoRecorder
 from src.transcription import Transcriber
+from src.live_transcription import LiveTranscriber
+from src.slides import extract_slides
+from src.segments import export_segments
 from src.summarization import Summarizer
 from src.session_manager import SessionManager
+from src.pipeline import SegmentPipeline
 from src.utils import get_recording_type_from_user, RecordingType, setup_logging
 from src.config import config
 
@@ -28,6 +33,8 @@ class DualAudioBot:
         self.transcriber = Transcriber()
         self.summarizer = Summarizer()
         self.session_manager = SessionManager()
+        self.segment_pipeline = None
+        self.live_transcriber = None
         
     def start_interactive_recording(self):
         """Start interactive recording session"""
@@ -86,8 +93,7 @@ class DualAudioBot:
             print("\nPress Ctrl+C to stop early")
 
             # Start recording
-            self.audio_recorder.start_recording()
-            video_filename = self.video_recorder.start_recording()
+            video_filename = self._start_recording()
             
             time.sleep(duration * 60)
             
@@ -123,8 +129,7 @@ class DualAudioBot:
             print("🔊 System audio + 🎤 Microphone")
 
             # Start recording
-            self.audio_recorder.start_recording()
-            video_filename = self.video_recorder.start_recording(region=region)
+            video_filename = self._start_recording(region=region)
             
             time.sleep(duration * 60)
             
@@ -144,7 +149,7 @@ class DualAudioBot:
     def _handle_manual_recording(self, recording_type: RecordingType, custom_name: Optional[str]):
         """Handle manual recording control"""
         print("\n🎛️ Manual Control Mode")
-        print("Commands: 'start', 'stop', 'quit'")
+        print("Commands: 'start', 'stop', 'status', 'quit'")
 
         audio_file = None
         video_filename = None
@@ -154,8 +159,7 @@ class DualAudioBot:
 
             if command == 'start':
                 if not self.audio_recorder.recording:
-                    self.audio_recorder.start_recording()
-                    video_filename = self.video_recorder.start_recording()
+                    video_filename = self._start_recording()
                     print("✅ DUAL recording started!")
                     print("🔊 System audio + 🎤 Microphone + 📺 Screen")
                 else:
@@ -171,6 +175,12 @@ class DualAudioBot:
                 else:
                     print("⚠️ Not recording!")
 
+            elif command == 'status':
+                if self.audio_recorder.recording:
+                    self._print_capture_stats()
+                else:
+                    print("⚠️ Not recording!")
+
             elif command == 'quit':
                 if self.audio_recorder.recording:
                     self.audio_recorder.stop_recording()
@@ -178,7 +188,34 @@ class DualAudioBot:
                 break
 
             else:
-                print("❌ Unknown command. Use 'start', 'stop', or 'quit'")
+                print("❌ Unknown command. Use 'start', 'stop', 'status', or 'quit'")
+
+    def _print_capture_stats(self):
+        """Print live audio capture health for each source"""
+        for source, stats in self.audio_recorder.get_capture_stats().items():
+            print(f"  🎚️ {source}: {stats['frames_captured'] / stats['sample_rate']:.1f}s captured, "
+                  f"{stats['overflow_events']} overflows, {stats['underflow_events']} underflows, "
+                  f"{stats['dropped_seconds']}s dropped")
+
+    def _start_recording(self, region: Optional[Tuple[int, int, int, int]] = None) -> str:
+        """Start audio and screen recording, transcribing live or per segment if enabled"""
+        on_segment = None
+        live_tap = None
+        if config.whisper.live_transcription and config.audio.streaming_capture:
+            live_file = os.path.join(config.paths.temp_dir, f"live_transcript_{time.strftime('%Y%m%d_%H%M%S')}.txt")
+            self.live_transcriber = LiveTranscriber(self.transcriber, live_file)
+            live_tap = self.live_transcriber.sink
+        elif config.segments.enabled:
+            self.segment_pipeline = SegmentPipeline(self.transcriber)
+            on_segment = self.segment_pipeline.submit
+
+        self.audio_recorder.start_recording(on_segment=on_segment, live_tap=live_tap)
+        if self.live_transcriber:
+            self.live_transcriber.start()
+        # Per-speaker stems are transcribed in worker processes with their own models
+        if self.live_transcriber or self.segment_pipeline or not (config.whisper.separate_speakers and config.audio.keep_stems):
+            self.transcriber.warm_up()
+        return self.video_recorder.start_recording(region=region)
 
     def _process_and_organize(self, audio_file: str, video_filename: str, 
                             recording_type: RecordingType, custom_name: Optional[str]):
@@ -188,8 +225,23 @@ class DualAudioBot:
         # Create session
         session_path = self.session_manager.create_session(recording_type, custom_name)
         
-        # Transcribe audio
-        transcript_file = self.transcriber.transcribe(audio_file)
+        # Transcribe audio: finish the live transcript or segment pipeline, per-speaker stems, or the mix
+        stems = self.audio_recorder.stem_transcription_files
+        if self.live_transcriber:
+            transcript_file = self.live_transcriber.finish()
+            transcript_segments = self.live_transcriber.segments
+            self.live_transcriber = None
+        elif self.segment_pipeline:
+            transcript_file = self.segment_pipeline.finish(os.path.splitext(audio_file)[0] + "_transcript.txt")
+            transcript_segments = self.segment_pipeline.segments
+            self.segment_pipeline = None
+        elif config.whisper.separate_speakers and len(stems) > 1:
+            transcript_file = self.transcriber.transcribe_stems(stems, os.path.splitext(audio_file)[0] + "_transcript.txt")
+            transcript_segments = self.transcriber.last_segments
+        else:
+            transcript_file = self.transcriber.transcribe(audio_file, audio=self.audio_recorder.transcription_audio)
+            transcript_segments = self.transcriber.last_segments
+        self.audio_recorder.discard_transcription_audio()
         
         # Generate summary
         summary_file = None
@@ -199,18 +251,59 @@ class DualAudioBot:
             summary_file = self.summarizer.generate_summary(transcript, recording_type)
         
         # Organize files
-        video_file = f"{video_filename}.{config.video.extension}" if video_filename else None
+        video_file = self.video_recorder.video_filename if video_filename else None
         organized_files = self.session_manager.organize_files(
-            session_path, audio_file, video_file, transcript_file, summary_file
+            session_path, audio_file, video_file, transcript_file, summary_file,
+            stem_files=self.audio_recorder.stem_files,
+            proxy_file=self.video_recorder.proxy_filename if video_filename else None
         )
         
+        # Save timed segments and subtitles next to the transcript
+        if transcript_segments:
+            organized_files.update(export_segments(transcript_segments, session_path,
+                                                   self.transcriber.last_language or config.whisper.language))
+        
+        # Mux audio and video into one synchronized file
+        av_sync = self._av_sync()
+        if organized_files.get('audio') and organized_files.get('video') and config.video.mux_audio:
+            muxed_file = self.session_manager.mux_audio_video(
+                session_path, organized_files['audio'], organized_files['video'],
+                av_sync.get('audio_offset_seconds', 0.0)
+            )
+            if muxed_file:
+                organized_files['recording'] = muxed_file
+        
+        # Extract lesson slides linked to the transcript
+        if organized_files.get('video') and (config.slides.enabled or recording_type == RecordingType.LESSON):
+            slides_file = extract_slides(organized_files['video'], session_path, transcript_segments,
+                                         av_sync.get('audio_offset_seconds', 0.0))
+            if slides_file:
+                organized_files['slides'] = slides_file
+        
         # Create session info
-        self.session_manager.create_session_info(session_path, recording_type, custom_name, organized_files)
+        metadata = {
+            'audio_capture': self.audio_recorder.get_capture_stats(),
+            'audio_alignment': self.audio_recorder.alignment,
+            'video_capture': self.video_recorder.get_capture_stats(),
+            'av_sync': av_sync,
+        }
+        self.session_manager.create_session_info(session_path, recording_type, custom_name, organized_files, metadata)
         
         # Print summary
         self.session_manager.print_session_summary(session_path)
         print("\n✅ Session processed successfully!")
 
+    def _av_sync(self) -> dict:
+        """Start/stop times of both recorders relative to the first video frame"""
+        audio, video = self.audio_recorder, self.video_recorder
+        if audio.start_time is None or video.start_time is None:
+            return {}
+        return {
+            'audio_offset_seconds': round(audio.start_time - video.start_time, 4),
+            'audio_stop_seconds': round(audio.stop_time - video.start_time, 4),
+            'video_stop_seconds': round(video.stop_time - video.start_time, 4),
+        }
+
     def cleanup(self):
         """Clean up resources"""
         try:
@@ -35,6 +35,7 @@ class DualAudioVideoBot:
 
         audio_filename = self.audio_recorder.start_recording()
         video_filename = self.video_recorder.start_recording()
+        self.transcriber.warm_up()
 
         logger.info("Recording started. Use Ctrl+C to stop.")
 
@@ -52,7 +53,8 @@ class DualAudioVideoBot:
     def process_recordings(self, audio_file: str, video_file: str, recording_type: RecordingType):
         """Process audio and video recordings for transcription and summarization"""
         # Transcribe audio
-        transcript_file = self.transcriber.transcribe(audio_file)
+        transcript_file = self.transcriber.transcribe(audio_file, audio=self.audio_recorder.transcription_audio)
+        self.audio_recorder.discard_transcription_audio()
 
         # Summarize transcript
         if transcript_file:
@@ -0,0 +1,546 @@
+"""
+Streaming audio I/O: capture ring buffers and incremental WAV writing
+"""
+
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import threading
+import time
+import numpy as np
+from array import array
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional
+from src.config import config
+from src.utils import setup_logging
+
+logger = setup_logging(level=config.log_level)
+
+# Codec name -> (file extension, ffmpeg encoder arguments); WAV is written natively
+AUDIO_CODECS = {
+    'wav': ('.wav', None),
+    'flac': ('.flac', ['-c:a', 'flac', '-compression_level', '5']),
+    'opus': ('.opus', ['-c:a', 'libopus', '-application', 'voip', '-ar', '48000']),
+}
+
+@dataclass
+class CaptureStats:
+    """Per-device capture health counters, updated live from the capture callback"""
+    device: str = ""
+    sample_rate: int = 0
+    callbacks: int = 0
+    frames_captured: int = 0
+    overflow_events: int = 0
+    underflow_events: int = 0
+    dropped_frames: int = 0
+    estimated_lost_frames: int = 0
+    _next_adc_time: float = 0.0
+
+    def record_chunk(self, frame_count: int, overflow: bool = False, underflow: bool = False,
+                     delivered: bool = True, adc_time: float = 0.0):
+        """Account for one chunk delivered by the device"""
+        self.callbacks += 1
+        self.frames_captured += frame_count
+        if overflow:
+            self.overflow_events += 1
+        if underflow:
+            self.underflow_events += 1
+        if not delivered:
+            self.dropped_frames += frame_count
+
+        if adc_time > 0 and self.sample_rate:
+            if self._next_adc_time > 0:
+                gap = adc_time - self._next_adc_time
+                if gap * self.sample_rate >= 1:
+                    self.estimated_lost_frames += int(round(gap * self.sample_rate))
+            self._next_adc_time = adc_time + frame_count / self.sample_rate
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable snapshot without internal bookkeeping"""
+        stats = asdict(self)
+        stats.pop('_next_adc_time')
+        stats['dropped_seconds'] = round(
+            (self.dropped_frames + self.estimated_lost_frames) / self.sample_rate, 3
+        ) if self.sample_rate else 0.0
+        return stats
+
+class TimingTrack:
+    """Monotonic capture timestamp of every chunk delivered to a stem"""
+    def __init__(self):
+        self.frames_delivered = 0
+        self._frames = array('q')
+        self._times = array('d')
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    def record(self, frame_count: int, timestamp: float):
+        """Stamp the first frame of a delivered chunk"""
+        self._frames.append(self.frames_delivered)
+        self._times.append(timestamp)
+        self.frames_delivered += frame_count
+
+    def arrays(self):
+        """Return (frame_index, timestamp) arrays for every recorded chunk"""
+        # Slice before converting: exporting the live arrays' buffers would make
+        # a concurrent append from the capture callback fail
+        count = len(self._times)
+        return np.array(self._frames[:count], dtype=np.int64), np.array(self._times[:count], dtype=np.float64)
+
+class RingBuffer:
+    """
+    Bounded, preallocated single-producer/single-consumer byte ring buffer
+
+    The producer only advances the write position and the consumer only
+    advances the read position, so neither side needs a lock.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._write_pos = 0
+        self._read_pos = 0
+        self.dropped_bytes = 0
+
+    def available(self) -> int:
+        """Number of bytes waiting to be read"""
+        return self._write_pos - self._read_pos
+
+    def free(self) -> int:
+        """Number of bytes that can be written without dropping"""
+        return self.capacity - self.available()
+
+    def write(self, data) -> bool:
+        """Append a whole chunk, or drop it entirely if it does not fit"""
+        size = len(data)
+        if size > self.free():
+            self.dropped_bytes += size
+            return False
+
+        data = memoryview(data).cast('B')
+        start = self._write_pos % self.capacity
+        first = min(size, self.capacity - start)
+        self._view[start:start + first] = data[:first]
+        if first < size:
+            self._view[:size - first] = data[first:size]
+
+        self._write_pos += size
+        return True
+
+    def read(self, max_bytes: int) -> bytes:
+        """Remove and return up to max_bytes from the buffer"""
+        size = min(max_bytes, self.available())
+        if size <= 0:
+            return b''
+
+        start = self._read_pos % self.capacity
+        first = min(size, self.capacity - start)
+        data = bytes(self._view[start:start + first])
+        if first < size:
+            data += bytes(self._view[:size - first])
+
+        self._read_pos += size
+        return data
+
+class WavStreamWriter:
+    """
+    Incrementally written PCM WAV file
+
+    The RIFF header is rewritten every header_interval seconds so the file
+    stays playable if the process dies mid-recording; on_header_update() is
+    called after each rewrite, once the data it covers is on disk.
+    """
+    def __init__(self, path: str, channels: int, sample_rate: int, sample_width: int = 2,
+                 header_interval: Optional[float] = None, on_header_update: Optional[Callable[[], None]] = None):
+        self.path = path
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.header_interval = config.audio.wav_header_interval if header_interval is None else header_interval
+        self.on_header_update = on_header_update
+        self.data_bytes = 0
+        self._file = open(path, 'wb')
+        self._write_header()
+        self._last_header_update = time.monotonic()
+
+    @property
+    def frames_written(self) -> int:
+        """Number of complete frames written so far"""
+        return self.data_bytes // (self.channels * self.sample_width)
+
+    def _write_header(self):
+        """Write a 44-byte canonical WAV header for the current data size"""
+        byte_rate = self.sample_rate * self.channels * self.sample_width
+        block_align = self.channels * self.sample_width
+        self._file.write(struct.pack(
+            '<4sI4s4sIHHIIHH4sI',
+            b'RIFF', 36 + self.data_bytes, b'WAVE',
+            b'fmt ', 16, 1, self.channels, self.sample_rate, byte_rate, block_align, self.sample_width * 8,
+            b'data', self.data_bytes
+        ))
+
+    def write(self, data: bytes):
+        """Append raw PCM data"""
+        self._file.write(data)
+        self.data_bytes += len(data)
+
+        if time.monotonic() - self._last_header_update >= self.header_interval:
+            self.update_header()
+
+    def update_header(self):
+        """Patch the RIFF and data chunk sizes and flush to disk"""
+        position = self._file.tell()
+        self._file.seek(4)
+        self._file.write(struct.pack('<I', 36 + self.data_bytes))
+        self._file.seek(40)
+        self._file.write(struct.pack('<I', self.data_bytes))
+        self._file.seek(position)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_header_update = time.monotonic()
+        if self.on_header_update:
+            self.on_header_update()
+
+    def close(self):
+        """Finalize the header and close the file"""
+        if self._file.closed:
+            return
+        self.update_header()
+        self._file.close()
+
+class SegmentedWavWriter:
+    """
+    WAV sink that rotates to a new file every segment_frames frames
+
+    on_segment_closed(index, path) is called from the writer thread as soon
+    as each segment file is finalized, and on_segment_progress(index, path)
+    whenever the open segment's header is patched to cover newly written
+    frames.
+    """
+    def __init__(self, path_template: str, channels: int, sample_rate: int, segment_frames: int,
+                 on_segment_closed: Optional[Callable[[int, str], None]] = None,
+                 on_segment_progress: Optional[Callable[[int, str], None]] = None):
+        self.path_template = path_template
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.segment_frames = segment_frames
+        self.on_segment_closed = on_segment_closed
+        self.on_segment_progress = on_segment_progress
+        self.frame_bytes = channels * 2
+        self.index = 0
+        self.paths = []
+        self._writer = None
+        self._open_segment()
+
+    def _open_segment(self):
+        path = self.path_template.format(index=self.index)
+        progress = None
+        if self.on_segment_progress:
+            progress = lambda index=self.index: self.on_segment_progress(index, path)
+        self._writer = WavStreamWriter(path, self.channels, self.sample_rate, on_header_update=progress)
+        self.paths.append(path)
+
+    def _close_segment(self):
+        self._writer.close()
+        if self.on_segment_closed:
+            self.on_segment_closed(self.index, self._writer.path)
+
+    def write(self, data: bytes):
+        """Append raw PCM data, splitting it across segment boundaries"""
+        view = memoryview(data)
+        while len(view):
+            room = (self.segment_frames - self._writer.frames_written) * self.frame_bytes
+            self._writer.write(view[:room])
+            view = view[room:]
+            if self._writer.frames_written >= self.segment_frames:
+                self._close_segment()
+                self.index += 1
+                self._open_segment()
+
+    def close(self):
+        """Finalize the current segment"""
+        self._close_segment()
+
+class AudioEncoder:
+    """
+    Compress 16-bit PCM to FLAC or Opus through an ffmpeg pipe
+
+    write() only enqueues the block; a feeder thread pushes it into ffmpeg's
+    stdin, so a slow encoder never stalls the thread that drains the capture
+    ring buffer. The queue is bounded to keep memory use flat: when it is
+    full the block is dropped and counted, and complete turns False so the
+    caller can keep the raw stem instead.
+    """
+    def __init__(self, path: str, channels: int, sample_rate: int, codec: str,
+                 bitrate: Optional[str] = None, max_queued_blocks: int = 64):
+        self.path = path
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.codec = codec
+        self.data_bytes = 0
+        self._queue = queue.Queue(maxsize=max_queued_blocks)
+        self._failed = False
+        self.dropped_blocks = 0
+
+        args = list(AUDIO_CODECS[codec][1])
+        if codec == 'opus':
+            args += ['-b:a', bitrate or config.audio.opus_bitrate]
+
+        self._process = subprocess.Popen(
+            ['ffmpeg', '-y', '-loglevel', 'error', '-f', 's16le', '-ar', str(sample_rate),
+             '-ac', str(channels), '-i', 'pipe:0'] + args + [path],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        self._thread = threading.Thread(target=self._feed_loop, name=f"{codec}-encoder", daemon=True)
+        self._thread.start()
+
+    @property
+    def frames_written(self) -> int:
+        """Number of complete frames handed to the encoder so far"""
+        return self.data_bytes // (self.channels * 2)
+
+    def _feed_loop(self):
+        """Encoder thread function"""
+        while True:
+            data = self._queue.get()
+            if data is None:
+                break
+            if self._failed:
+                continue
+            try:
+                self._process.stdin.write(data)
+            except (BrokenPipeError, OSError) as e:
+                logger.error(f"{self.codec} encoder for {self.path} stopped accepting audio: {e}")
+                self._failed = True
+
+    @property
+    def complete(self) -> bool:
+        """Whether every block written so far reached the encoder"""
+        return not self._failed and self.dropped_blocks == 0
+
+    def write(self, data: bytes):
+        """Queue raw PCM data for encoding, dropping it if the encoder has fallen behind"""
+        try:
+            self._queue.put_nowait(bytes(data))
+        except queue.Full:
+            if not self.dropped_blocks:
+                logger.warning(f"{self.codec} encoder for {self.path} is falling behind - dropping blocks")
+            self.dropped_blocks += 1
+            return
+        self.data_bytes += len(data)
+
+    def close(self):
+        """Flush the queue, finish the ffmpeg stream and wait for the file to be written"""
+        if self._process.stdin.closed:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+        errors = self._process.stderr.read().decode(errors='replace').strip()
+        if self._process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to encode {self.path}: {errors}")
+
+def resolve_audio_codec(codec: Optional[str] = None) -> str:
+    """Validate the configured audio codec, falling back to WAV when ffmpeg is unavailable"""
+    codec = (codec or config.audio.codec).lower()
+    if codec not in AUDIO_CODECS:
+        logger.warning(f"Unknown audio codec '{codec}' - storing WAV")
+        return 'wav'
+    if codec != 'wav' and not shutil.which('ffmpeg'):
+        logger.warning(f"ffmpeg not found - storing WAV instead of {codec}")
+        return 'wav'
+    return codec
+
+def audio_extension(codec: str) -> str:
+    """File extension used for audio stored with the given codec"""
+    return AUDIO_CODECS[codec][0]
+
+def codec_from_path(path: str) -> str:
+    """Codec name of an audio file, judged by its extension"""
+    ext = os.path.splitext(path)[1].lower()
+    for codec, (codec_ext, _) in AUDIO_CODECS.items():
+        if ext == codec_ext:
+            return codec
+    return ext.lstrip('.')
+
+def open_audio_writer(path: str, channels: int, sample_rate: int, codec: str = 'wav'):
+    """Open a streaming sink for 16-bit PCM stored with the given codec"""
+    if codec == 'wav':
+        return WavStreamWriter(path, channels, sample_rate)
+    return AudioEncoder(path, channels, sample_rate, codec)
+
+def concatenate_wav_files(paths: List[str], output_path: str, block_bytes: int = 4 * 1024 * 1024,
+                          codec: str = 'wav') -> int:
+    """Join WAV files with identical formats into one file by copying their sample data"""
+    infos = [read_wav_info(path) for path in paths]
+    first = infos[0]
+    if codec == 'wav':
+        writer = WavStreamWriter(output_path, first['channels'], first['sample_rate'], first['sample_width'])
+    else:
+        writer = AudioEncoder(output_path, first['channels'], first['sample_rate'], codec)
+    try:
+        for path, info in zip(paths, infos):
+            if (info['channels'], info['sample_rate']) != (first['channels'], first['sample_rate']):
+                raise ValueError(f"Cannot concatenate WAV files with different formats: {path}")
+            remaining = info['frames'] * info['channels'] * info['sample_width']
+            with open(path, 'rb') as f:
+                f.seek(info['data_offset'])
+                while remaining > 0:
+                    data = f.read(min(block_bytes, remaining))
+                    if not data:
+                        break
+                    writer.write(data)
+                    remaining -= len(data)
+    finally:
+        writer.close()
+    return writer.frames_written
+
+def read_wav_info(path: str) -> Dict[str, Any]:
+    """Parse a PCM WAV header and locate its data chunk"""
+    with open(path, 'rb') as f:
+        riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            raise ValueError(f"Not a WAV file: {path}")
+
+        info = {}
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"No data chunk in WAV file: {path}")
+            chunk_id, chunk_size = struct.unpack('<4sI', header)
+
+            if chunk_id == b'fmt ':
+                fmt = f.read(chunk_size)
+                _, channels, sample_rate, _, _, bits = struct.unpack('<HHIIHH', fmt[:16])
+                info.update(channels=channels, sample_rate=sample_rate, sample_width=bits // 8)
+                if chunk_size % 2:
+                    f.seek(1, os.SEEK_CUR)
+            elif chunk_id == b'data':
+                if 'channels' not in info:
+                    raise ValueError(f"Data chunk before fmt chunk in WAV file: {path}")
+                offset = f.tell()
+                available = os.path.getsize(path) - offset
+                data_size = min(chunk_size, available) if chunk_size else available
+                info['data_offset'] = offset
+                info['frames'] = data_size // (info['channels'] * info['sample_width'])
+                return info
+            else:
+                f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+def open_wav_memmap(path: str):
+    """Memory-map the samples of a 16-bit WAV file as a (frames, channels) array"""
+    info = read_wav_info(path)
+    if info['sample_width'] != 2:
+        raise ValueError(f"Only 16-bit PCM is supported: {path}")
+    if info['frames'] == 0:
+        return np.zeros((0, info['channels']), dtype='<i2'), info
+
+    samples = np.memmap(path, dtype='<i2', mode='r', offset=info['data_offset'],
+                        shape=(info['frames'], info['channels']))
+    return samples, info
+
+class WavSegmentsView:
+    """
+    Consecutive WAV segment files read as one (frames, channels) sample array
+
+    Only slicing with a unit step is supported; a slice that crosses segment
+    boundaries is assembled from the memory-mapped parts it touches.
+    """
+    def __init__(self, paths: List[str]):
+        self.parts = [open_wav_memmap(path)[0] for path in paths]
+        self.starts = np.cumsum([0] + [len(part) for part in self.parts])
+        channels = self.parts[0].shape[1] if self.parts else 1
+        self.shape = (int(self.starts[-1]), channels)
+        self.dtype = np.dtype('<i2')
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, key: slice) -> np.ndarray:
+        start, stop, _ = key.indices(len(self))
+        pieces = []
+        for part, part_start in zip(self.parts, self.starts):
+            lo, hi = max(start, part_start), min(stop, part_start + len(part))
+            if lo < hi:
+                pieces.append(part[lo - part_start:hi - part_start])
+        if not pieces:
+            return np.zeros((0, self.shape[1]), dtype=self.dtype)
+        return pieces[0] if len(pieces) == 1 else np.concatenate(pieces)
+
+def open_wav_segments(paths: List[str]):
+    """Open consecutive WAV segments of one stream as a single WavSegmentsView"""
+    view = WavSegmentsView(paths)
+    return view, read_wav_info(paths[0])
+
+class CaptureWriter:
+    """
+    Drain a capture ring buffer into one or more sinks on a background thread
+
+    Sinks only need write(bytes) and close() methods. Producers push whole
+    frames of frame_bytes (channels * sample width), and read_size is rounded
+    down to a multiple of it, so no block handed to a sink splits a frame.
+    """
+    def __init__(self, name: str, ring_bytes: int, sinks: List, poll_interval: float = 0.02,
+                 read_size: int = 256 * 1024, frame_bytes: int = 1):
+        self.name = name
+        self.ring = RingBuffer(ring_bytes)
+        self.sinks = list(sinks)
+        self.poll_interval = poll_interval
+        self.read_size = max(frame_bytes, read_size // frame_bytes * frame_bytes)
+        self.bytes_written = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Start the background writer thread"""
+        self._running = True
+        self._thread = threading.Thread(target=self._drain_loop, name=f"{self.name}-writer", daemon=True)
+        self._thread.start()
+
+    def push(self, data: bytes) -> bool:
+        """Queue captured data for writing; returns False if it was dropped"""
+        return self.ring.write(data)
+
+    def _drain_loop(self):
+        """Writer thread function"""
+        while self._running:
+            if not self._drain_once():
+                time.sleep(self.poll_interval)
+
+        while self._drain_once():
+            pass
+
+    def _drain_once(self) -> bool:
+        """Move one block from the ring buffer to every sink"""
+        data = self.ring.read(self.read_size)
+        if not data:
+            return False
+
+        for sink in self.sinks:
+            try:
+                sink.write(data)
+            except Exception as e:
+                logger.error(f"{self.name} sink write error: {e}")
+
+        self.bytes_written += len(data)
+        return True
+
+    def stop(self):
+        """Flush remaining data and close all sinks"""
+        self._running = False
+        if self._thread:
+            self._thread.join()
+
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                logger.error(f"{self.name} sink close error: {e}")
+
+        if self.ring.dropped_bytes:
+            logger.warning(f"{self.name}: dropped {self.ring.dropped_bytes} bytes (writer fell behind)")
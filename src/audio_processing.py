@@ -3,23 +3,277 @@ Audio processing for dual audio recording
 """
 
 import pyaudio
-import wave
-from pydub import AudioSegment
+import numpy as np
+import hashlib
+import json
 import os
 import threading
+import time
 from datetime import datetime
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from math import gcd
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from src.config import config
 from src.utils import setup_logging
+from src.audio_io import (AudioEncoder, CaptureStats, CaptureWriter, SegmentedWavWriter, TimingTrack,
+                          WavStreamWriter, audio_extension, concatenate_wav_files, open_audio_writer,
+                          open_wav_memmap, open_wav_segments, read_wav_info, resolve_audio_codec)
 
 logger = setup_logging(level=config.log_level)
 
+def db_to_gain(db: float) -> float:
+    """Convert a decibel change into a linear amplitude factor"""
+    return 10 ** (db / 20)
+
+class PolyphaseResampler:
+    """
+    Streaming rational-ratio resampler built on a windowed-sinc polyphase filter bank
+
+    Blocks of any size can be fed in; output samples are produced as soon as
+    their full filter support is available, so the result is identical to
+    resampling the whole signal at once.
+    """
+    def __init__(self, input_rate: int, output_rate: int, taps_per_phase: int = 64, beta: float = 8.0):
+        divisor = gcd(input_rate, output_rate)
+        self.up = output_rate // divisor
+        self.down = input_rate // divisor
+        self.taps = taps_per_phase
+
+        length = taps_per_phase * self.up
+        cutoff = 1.0 / max(self.up, self.down)
+        n = np.arange(length) - (length - 1) / 2
+        prototype = cutoff * np.sinc(cutoff * n) * np.kaiser(length, beta) * self.up
+        self.bank = prototype.reshape(taps_per_phase, self.up).T[:, ::-1].astype(np.float32)
+        self.delay = (length - 1) // 2
+
+        self._history = np.zeros(taps_per_phase - 1, dtype=np.float32)
+        self._history_start = -(taps_per_phase - 1)
+        self._input_count = 0
+        self._output_count = 0
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """Feed mono float samples and return every output sample now available"""
+        buffer = np.concatenate([self._history, samples.astype(np.float32, copy=False)])
+        self._input_count += len(samples)
+        return self._emit(buffer, self._history_start + len(buffer) - 1)
+
+    def flush(self) -> np.ndarray:
+        """Emit the remaining tail once the input has ended"""
+        total = -(-self._input_count * self.up // self.down)
+        buffer = np.concatenate([self._history, np.zeros(self.taps, dtype=np.float32)])
+        return self._emit(buffer, self._history_start + len(buffer) - 1, limit=total)
+
+    def _emit(self, buffer: np.ndarray, last_index: int, limit: Optional[int] = None) -> np.ndarray:
+        """Compute outputs whose newest input sample is at or before last_index"""
+        stop = (last_index * self.up + self.up - 1 - self.delay) // self.down + 1
+        if limit is not None:
+            stop = min(stop, limit)
+
+        start = self._output_count
+        if stop <= start:
+            # Nothing to emit yet: the new input is still needed later
+            self._history = buffer
+            return np.zeros(0, dtype=np.float32)
+
+        # Outputs whose index differs by a multiple of `up` share a filter phase
+        # and step through the input by `down`, so each phase is one strided
+        # matrix-vector product over a sliding-window view of the buffer.
+        windows = np.lib.stride_tricks.sliding_window_view(buffer, self.taps)
+        output = np.empty(stop - start, dtype=np.float32)
+        for offset in range(min(self.up, stop - start)):
+            first = start + offset
+            position = first * self.down + self.delay
+            oldest = position // self.up - self._history_start - (self.taps - 1)
+            count = len(range(first, stop, self.up))
+            rows = windows[oldest:oldest + count * self.down:self.down]
+            output[offset::self.up] = rows @ self.bank[position % self.up]
+
+        self._output_count = stop
+        next_newest = (stop * self.down + self.delay) // self.up
+        keep_from = max(0, next_newest - (self.taps - 1) - self._history_start)
+        self._history = buffer[keep_from:].copy()
+        self._history_start += keep_from
+        return output
+
+class TranscriptionAudioWriter:
+    """
+    Downmix and resample mixed int16 blocks into a 16 kHz mono float32 file for Whisper
+
+    The file is raw float32 so it can be memory-mapped and handed to the
+    Transcriber without another decode.
+    """
+    def __init__(self, path: str, input_rate: int, output_rate: Optional[int] = None):
+        self.path = path
+        self.output_rate = output_rate or config.audio.transcription_sample_rate
+        self.resampler = PolyphaseResampler(input_rate, self.output_rate)
+        self.samples_written = 0
+        self._file = open(path, 'wb')
+
+    def write_block(self, block: np.ndarray):
+        """Append a (frames, channels) block in int16 scale"""
+        mono = block.mean(axis=1) / 32768.0
+        self._write(self.resampler.process(mono))
+
+    def _write(self, samples: np.ndarray):
+        self._file.write(samples.astype(np.float32).tobytes())
+        self.samples_written += len(samples)
+
+    def close(self) -> np.ndarray:
+        """Flush the resampler and return the result memory-mapped"""
+        self._write(self.resampler.flush())
+        self._file.close()
+        if self.samples_written == 0:
+            return np.zeros(0, dtype=np.float32)
+        return np.memmap(self.path, dtype=np.float32, mode='c', shape=(self.samples_written,))
+
+def fit_capture_clock(frames: np.ndarray, times: np.ndarray) -> Tuple[float, float]:
+    """
+    Fit time = t0 + seconds_per_frame * frame to a device's chunk timestamps
+
+    Scheduling jitter only ever delays a timestamp, so after a first
+    least-squares fit the line is refitted to the earliest half of the points.
+    """
+    frames = frames.astype(np.float64)
+    slope, intercept = np.polyfit(frames, times, 1)
+    residuals = times - (intercept + slope * frames)
+    early = residuals <= np.median(residuals)
+    if early.sum() >= 2:
+        slope, intercept = np.polyfit(frames[early], times[early], 1)
+    return float(intercept), float(slope)
+
+def estimate_alignment(clocks: Dict[str, Tuple[float, float]], reference: str) -> Dict[str, Tuple[float, float]]:
+    """
+    Map every source onto the reference clock
+
+    Returns {source: (offset, ratio)} such that output frame n reads source
+    frame offset + ratio * n. The output timeline starts at the earliest
+    source and runs at the reference device's rate; the reference itself
+    always gets an integral offset and a ratio of exactly 1.
+    """
+    ref_t0, ref_period = clocks[reference]
+    earliest = min(t0 for t0, _ in clocks.values())
+    origin = ref_t0 + ref_period * float(np.floor((earliest - ref_t0) / ref_period))
+
+    alignment = {}
+    for source, (t0, period) in clocks.items():
+        if source == reference:
+            alignment[source] = (float(round((origin - t0) / period)), 1.0)
+        else:
+            alignment[source] = (float((origin - t0) / period), float(ref_period / period))
+    return alignment
+
+def _render_source_block(samples: np.ndarray, offset: float, ratio: float, start: int, count: int) -> np.ndarray:
+    """Read output frames [start, start + count) of a source through its (offset, ratio) mapping"""
+    block = np.zeros((count, samples.shape[1]), dtype=np.float32)
+    length = len(samples)
+
+    if ratio == 1.0 and offset == int(offset):
+        first = start + int(offset)
+        lo, hi = max(first, 0), min(first + count, length)
+        if lo < hi:
+            block[lo - first:hi - first] = samples[lo:hi]
+        return block
+
+    first = max(start, int(np.ceil(-offset / ratio)))
+    last = min(start + count, int(np.floor((length - 1 - offset) / ratio)) + 1)
+    if first >= last:
+        return block
+
+    positions = offset + ratio * np.arange(first, last, dtype=np.float64)
+    base = positions.astype(np.int64)
+    lo = int(base[0])
+    hi = min(int(base[-1]) + 2, length)
+    window = samples[lo:hi].astype(np.float32)
+
+    index = base - lo
+    upper = np.minimum(index + 1, len(window) - 1)
+    frac = (positions - base).astype(np.float32)[:, None]
+    lower_samples = window[index]
+    block[first - start:last - start] = lower_samples + frac * (window[upper] - lower_samples)
+    return block
+
+def mix_wav_files(sources: List[Tuple[Union[str, List[str]], float]], output_path: str,
+                  block_frames: Optional[int] = None,
+                  alignments: Optional[List[Tuple[float, float]]] = None,
+                  block_callback: Optional[Callable[[np.ndarray], None]] = None,
+                  source_callbacks: Optional[List[Optional[Callable[[np.ndarray], None]]]] = None,
+                  codec: str = 'wav',
+                  frame_range: Optional[Tuple[int, Optional[int]]] = None) -> int:
+    """
+    Mix 16-bit WAV files with per-source gain into a single file in one streaming pass
+
+    Inputs are memory-mapped and processed in fixed-size blocks, so memory use
+    is O(block_frames) regardless of recording length. Mono sources are
+    spread across all output channels. Each source can carry an
+    (offset, ratio) alignment from estimate_alignment(), applied with
+    fractional linear interpolation. The output covers the longest source;
+    shorter ones are padded with silence. block_callback, if given, receives
+    every clipped float32 output block in the same pass; source_callbacks
+    receive each source's aligned block before gain. The output is stored as
+    WAV or, for 'flac'/'opus', encoded by ffmpeg as it is mixed. A source
+    given as a list of paths is read as one stream of consecutive segment
+    files, and frame_range=(start, end) renders only those output frames of
+    the full timeline (end=None runs to the end). Returns the number of
+    frames written.
+    """
+    block_frames = block_frames or config.audio.mix_block_frames
+    alignments = alignments or [(0.0, 1.0)] * len(sources)
+    source_callbacks = source_callbacks or [None] * len(sources)
+    stems = []
+    for (path, gain), (offset, ratio), callback in zip(sources, alignments, source_callbacks):
+        samples, info = open_wav_segments(path) if isinstance(path, list) else open_wav_memmap(path)
+        if len(samples):
+            stems.append((samples, info, gain, offset, ratio, callback))
+
+    if not stems:
+        return 0
+
+    sample_rate = stems[0][1]['sample_rate']
+    channels = max(stem[1]['channels'] for stem in stems)
+    total_frames = max(int(np.floor((len(samples) - 1 - offset) / ratio)) + 1
+                       for samples, _, _, offset, ratio, _ in stems)
+    first, last = frame_range or (0, None)
+    last = total_frames if last is None else last
+
+    writer = open_audio_writer(output_path, channels, sample_rate, codec)
+    mixed = np.empty((block_frames, channels), dtype=np.float32)
+
+    try:
+        for start in range(first, last, block_frames):
+            count = min(block_frames, last - start)
+            block = mixed[:count]
+            block.fill(0)
+
+            for samples, info, gain, offset, ratio, callback in stems:
+                source = _render_source_block(samples, offset, ratio, start, count)
+                if callback:
+                    callback(source)
+                if info['channels'] != channels and info['channels'] != 1:
+                    source = source.mean(axis=1, keepdims=True)
+                block += source * gain
+
+            np.clip(block, -32768, 32767, out=block)
+            writer.write(block.astype('<i2').tobytes())
+            if block_callback:
+                block_callback(block)
+    finally:
+        writer.close()
+
+    return max(0, last - first)
+
+def device_fingerprint(devices: List[Tuple[int, str, int]]) -> str:
+    """Stable hash of (index, name, input channels) for a list of audio devices"""
+    digest = hashlib.sha1()
+    for index, name, channels in devices:
+        digest.update(f"{index}\x00{name}\x00{channels}\n".encode('utf-8'))
+    return digest.hexdigest()
+
 class AudioRecorder:
     """
     Dual audio recorder implementation
     """
     def __init__(self):
-        self.audio_interface = pyaudio.PyAudio()
+        self._audio_interface = None
         self.system_audio_frames = []
         self.mic_audio_frames = []
         self.recording = False
@@ -27,18 +281,135 @@ class AudioRecorder:
         self.mic_device = None
         self.system_device_info = None
         self.mic_device_info = None
+        self.capture_writers = {}
+        self.stem_files = {}
+        self.encoded_stem_files = {}
+        self.stem_encoders = {}
+        self.audio_codec = 'wav'
+        self.source_channels = {}
+        self.capture_stats = {}
+        self.timing_tracks = {}
+        self.alignment = {}
+        self.start_time = None
+        self.stop_time = None
+        self.transcription_audio = None
+        self.transcription_audio_file = None
+        self.stem_transcription_audio = {}
+        self.stem_transcription_files = {}
+        self.on_segment = None
+        self.live_tap = None
+        self.segmented = False
+        self.segment_files = {}
+        self.mixed_segment_files = {}
+        self.segment_whisper_files = {}
+        self._segment_sources = set()
+        self._open_segments = {}
+        self._segment_alignments = {}
+        self._segment_lock = threading.Lock()
+        self._segment_mixer = None
+        self.recording_timestamp = None
+        self._stop_event = threading.Event()
+
+    @property
+    def audio_interface(self) -> pyaudio.PyAudio:
+        """PortAudio handle, initialized on first use"""
+        if self._audio_interface is None:
+            self._audio_interface = pyaudio.PyAudio()
+        return self._audio_interface
+
+    def _device_cache_path(self) -> str:
+        """Location of the persisted device selection"""
+        return os.path.join(config.paths.cache_dir, "audio_devices.json")
+
+    def _enumerate_devices(self) -> List[Tuple[int, dict]]:
+        """Every PortAudio device with its info"""
+        return [(i, self.audio_interface.get_device_info_by_index(i))
+                for i in range(self.audio_interface.get_device_count())]
+
+    @staticmethod
+    def _devices_fingerprint(devices: List[Tuple[int, dict]]) -> str:
+        return device_fingerprint([(i, info['name'], info['maxInputChannels']) for i, info in devices])
+
+    def _load_cached_devices(self) -> bool:
+        """
+        Restore the previously selected devices if the device list is unchanged
+
+        Revalidation enumerates the device list once and compares its
+        fingerprint, skipping the keyword matching of a full scan. Only
+        complete selections are cached, so a missing device is always
+        searched for again.
+        """
+        cache_path = self._device_cache_path()
+        if not os.path.exists(cache_path):
+            return False
+
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+
+            devices = self._enumerate_devices()
+            if cache.get('fingerprint') != self._devices_fingerprint(devices):
+                logger.info("Audio device list changed - rescanning")
+                return False
+
+            infos = dict(devices)
+            selected = {}
+            for source in ('system', 'mic'):
+                cached = cache.get(source)
+                if cached is None or cached.get('index') not in infos:
+                    return False
+                selected[source] = (cached['index'], infos[cached['index']])
+
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable audio device cache: {e}")
+            return False
+
+        self.system_audio_device, self.system_device_info = selected['system']
+        self.mic_device, self.mic_device_info = selected['mic']
+        for label, device_info in (("system audio", self.system_device_info), ("microphone", self.mic_device_info)):
+            logger.info(f"✅ Using cached {label}: {device_info['name']}")
+        return True
+
+    def _save_device_cache(self, devices: List[Tuple[int, dict]]):
+        """Persist the selected devices keyed by a fingerprint of the full device list"""
+        cache_path = self._device_cache_path()
+        try:
+            if self.system_audio_device is None or self.mic_device is None:
+                # Don't remember a failed search: the device may be plugged in next time
+                if os.path.exists(cache_path):
+                    os.remove(cache_path)
+                return
+
+            cache = {
+                'fingerprint': self._devices_fingerprint(devices),
+                'system': {'index': self.system_audio_device, 'name': self.system_device_info['name']},
+                'mic': {'index': self.mic_device, 'name': self.mic_device_info['name']},
+            }
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            logger.warning(f"Could not save audio device cache: {e}")
+
+    def find_audio_devices(self, refresh: bool = False):
+        """
+        Find and set input devices for system audio and microphone
+
+        The selection is cached; pass refresh=True to force a full scan.
+        """
+        if config.audio.device_cache and not refresh and self._load_cached_devices():
+            return
 
-    def find_audio_devices(self):
-        """Find and set input devices for system audio and microphone"""
         logger.info("Scanning for audio devices...")
+        self.system_audio_device = self.system_device_info = None
+        self.mic_device = self.mic_device_info = None
         system_keywords = ['stereo mix', 'what you hear', 'wave out mix', 'loopback', 'monitor']
         mic_keywords = ['microphone', 'mic', 'hyperx', 'webcam', 'camera', 'headset', 'array']
         system_candidates = []
         mic_candidates = []
 
         try:
-            for i in range(self.audio_interface.get_device_count()):
-                device_info = self.audio_interface.get_device_info_by_index(i)
+            devices = self._enumerate_devices()
+            for i, device_info in devices:
                 if device_info['maxInputChannels'] > 0:
                     device_name = device_info['name'].lower()
                     logger.info(f"  {i}: {device_info['name']} (channels: {device_info['maxInputChannels']})")
@@ -78,14 +449,63 @@ class AudioRecorder:
             if self.mic_device is None:
                 logger.warning("⚠️ No microphone found!")
 
+            if config.audio.device_cache:
+                self._save_device_cache(devices)
+
         except Exception as e:
             logger.error(f"Error scanning devices: {e}")
 
-    def start_recording(self):
-        """Start recording audio from system and microphone"""
+    def start_recording(self, on_segment: Optional[Callable[[int, float, str, Optional[str]], None]] = None,
+                        live_tap: Optional[Callable[[str, int, int, TimingTrack], Any]] = None):
+        """
+        Start recording audio from system and microphone
+
+        With segmented recording enabled, on_segment(index, start_seconds,
+        mixed_wav, whisper_f32) is called as soon as each segment has been
+        captured and mixed. live_tap(source, channels, sample_rate, timing) may
+        return an extra sink that receives every captured block while
+        recording; timing is the source's TimingTrack, filled as it captures.
+        """
         self.recording = True
         self.system_audio_frames = []
         self.mic_audio_frames = []
+        self.capture_writers = {}
+        self.stem_files = {}
+        self.encoded_stem_files = {}
+        self.stem_encoders = {}
+        self.audio_codec = 'wav'
+        self.source_channels = {}
+        self.capture_stats = {}
+        self.timing_tracks = {}
+        self.alignment = {}
+        self.start_time = None
+        self.stop_time = None
+        self.transcription_audio = None
+        self.transcription_audio_file = None
+        self.stem_transcription_audio = {}
+        self.stem_transcription_files = {}
+        self.on_segment = None
+        self.live_tap = None
+        self.segmented = False
+        self.segment_files = {}
+        self.mixed_segment_files = {}
+        self.segment_whisper_files = {}
+        self._segment_sources = set()
+        self._open_segments = {}
+        self._segment_alignments = {}
+        self._segment_lock = threading.Lock()
+        self._segment_mixer = None
+        self.recording_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._stop_event = threading.Event()
+        self.on_segment = on_segment
+        self.live_tap = live_tap
+        if live_tap and not config.audio.streaming_capture:
+            logger.warning("Live transcription needs streaming_capture - disabled")
+        self.segmented = config.segments.enabled and config.audio.streaming_capture
+        if self.segmented:
+            # Mixing runs off the capture writer threads so their ring buffers keep draining
+            self._segment_mixer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="segment-mixer")
+        self.audio_codec = resolve_audio_codec()
 
         self.system_audio_thread = threading.Thread(target=self.record_system_audio)
         self.mic_audio_thread = threading.Thread(target=self.record_microphone)
@@ -100,71 +520,145 @@ class AudioRecorder:
             logger.warning("No system audio device - skipping")
             return
 
-        try:
-            format = pyaudio.paInt16
-            channels = min(config.audio.channels, self.system_device_info['maxInputChannels'])
+        self._record_source('system', self.system_audio_device, self.system_device_info, self.system_audio_frames)
 
-            stream = self.audio_interface.open(
-                format=format,
-                channels=channels,
-                rate=config.audio.sample_rate,
-                input=True,
-                input_device_index=self.system_audio_device,
-                frames_per_buffer=config.audio.chunk_size
+    def record_microphone(self):
+        """Record microphone (your voice)"""
+        if self.mic_device is None:
+            logger.warning("No microphone device - skipping")
+            return
+
+        self._record_source('mic', self.mic_device, self.mic_device_info, self.mic_audio_frames)
+
+    def _create_capture_writer(self, source: str, channels: int) -> CaptureWriter:
+        """
+        Create the ring buffer and background writer for one source
+
+        The WAV stem feeds the mixer; when stems are kept and a compressed
+        codec is configured, the same blocks are also encoded on the fly so
+        the archived stem never has to be transcoded afterwards. The WAV is
+        still needed during capture: aligning and drift-correcting the mix
+        (and mixing segments while recording) needs sample-accurate random
+        access, and Opus is lossy. It is a temp file removed after mixing,
+        so only the stored session shrinks.
+        """
+        stem_path = os.path.join(config.paths.temp_dir, f"{source}_{self.recording_timestamp}.wav")
+        bytes_per_second = config.audio.sample_rate * channels * 2
+        ring_bytes = int(bytes_per_second * config.audio.ring_buffer_seconds)
+
+        if self.segmented:
+            template = os.path.join(config.paths.temp_dir, f"{source}_{self.recording_timestamp}_seg{{index:03d}}.wav")
+            wav_writer = SegmentedWavWriter(
+                template, channels, config.audio.sample_rate, self._segment_frames(),
+                on_segment_closed=lambda index, path: self._on_segment_closed(source, index, path),
+                on_segment_progress=lambda index, path: self._on_segment_progress(source, index, path)
             )
+            with self._segment_lock:
+                self._segment_sources.add(source)
+        else:
+            wav_writer = WavStreamWriter(stem_path, channels, config.audio.sample_rate)
+            self.stem_files[source] = stem_path
 
-            logger.info(f"Recording system audio: {channels} channels")
+        sinks = [wav_writer]
+        if self.audio_codec != 'wav' and config.audio.keep_stems:
+            encoded_path = os.path.join(config.paths.temp_dir,
+                                        f"{source}_{self.recording_timestamp}{audio_extension(self.audio_codec)}")
+            try:
+                encoder = AudioEncoder(encoded_path, channels, config.audio.sample_rate, self.audio_codec)
+                sinks.append(encoder)
+                self.encoded_stem_files[source] = encoded_path
+                self.stem_encoders[source] = encoder
+            except Exception as e:
+                logger.error(f"Could not start {self.audio_codec} encoder for {source}: {e}")
 
-            while self.recording:
-                try:
-                    data = stream.read(config.audio.chunk_size, exception_on_overflow=False)
-                    self.system_audio_frames.append(data)
-                except Exception as e:
-                    logger.error(f"System audio read error: {e}")
-                    break
+        if self.live_tap:
+            sinks.append(self.live_tap(source, channels, config.audio.sample_rate, self.timing_tracks.get(source)))
 
-            stream.stop_stream()
-            stream.close()
-            logger.info("System audio recording stopped")
+        writer = CaptureWriter(source, ring_bytes, sinks, frame_bytes=channels * 2)
+        writer.start()
 
-        except Exception as e:
-            logger.error(f"System audio recording error: {e}")
+        self.capture_writers[source] = writer
+        return writer
 
-    def record_microphone(self):
-        """Record microphone (your voice)"""
-        if self.mic_device is None:
-            logger.warning("No microphone device - skipping")
-            return
+    def _record_source(self, source: str, device_index: int, device_info: dict, frames: list):
+        """Capture thread shared by the system audio and microphone sources"""
+        label = "System audio" if source == 'system' else "Microphone"
+        writer = None
 
         try:
             format = pyaudio.paInt16
-            channels = min(config.audio.channels, self.mic_device_info['maxInputChannels'])
+            channels = min(config.audio.channels, device_info['maxInputChannels'])
+            self.source_channels[source] = channels
+
+            stats = CaptureStats(device=device_info['name'], sample_rate=config.audio.sample_rate)
+            self.capture_stats[source] = stats
+            timing = TimingTrack()
+            self.timing_tracks[source] = timing
+
+            writer = self._create_capture_writer(source, channels) if config.audio.streaming_capture else None
+            use_callback = config.audio.capture_mode == "callback"
+
+            def deliver(data, frame_count: int) -> bool:
+                captured_at = time.monotonic() - frame_count / config.audio.sample_rate
+                if writer and not writer.push(data):
+                    return False
+                if not writer:
+                    frames.append(data)
+                timing.record(frame_count, captured_at)
+                return True
+
+            def callback(in_data, frame_count, time_info, status_flags):
+                delivered = deliver(in_data, frame_count) if in_data else False
+                stats.record_chunk(
+                    frame_count,
+                    overflow=bool(status_flags & pyaudio.paInputOverflow),
+                    underflow=bool(status_flags & pyaudio.paInputUnderflow),
+                    delivered=delivered,
+                    adc_time=time_info.get('input_buffer_adc_time', 0.0) if time_info else 0.0
+                )
+                return (None, pyaudio.paContinue)
 
             stream = self.audio_interface.open(
                 format=format,
                 channels=channels,
                 rate=config.audio.sample_rate,
                 input=True,
-                input_device_index=self.mic_device,
-                frames_per_buffer=config.audio.chunk_size
+                input_device_index=device_index,
+                frames_per_buffer=config.audio.chunk_size,
+                stream_callback=callback if use_callback else None
             )
 
-            logger.info(f"Recording microphone: {channels} channels")
+            logger.info(f"Recording {label.lower()}: {channels} channels ({config.audio.capture_mode} mode)")
 
-            while self.recording:
-                try:
-                    data = stream.read(config.audio.chunk_size, exception_on_overflow=False)
-                    self.mic_audio_frames.append(data)
-                except Exception as e:
-                    logger.error(f"Microphone read error: {e}")
-                    break
+            if use_callback:
+                stream.start_stream()
+                self._stop_event.wait()
+            else:
+                while self.recording:
+                    try:
+                        data = stream.read(config.audio.chunk_size, exception_on_overflow=False)
+                        stats.record_chunk(config.audio.chunk_size, delivered=deliver(data, config.audio.chunk_size))
+                    except Exception as e:
+                        logger.error(f"{label} read error: {e}")
+                        break
 
             stream.stop_stream()
             stream.close()
-            logger.info("Microphone recording stopped")
+            logger.info(f"{label} recording stopped")
+
+            if stats.overflow_events or stats.dropped_frames or stats.estimated_lost_frames:
+                logger.warning(f"{label} capture lost audio: {stats.to_dict()}")
 
         except Exception as e:
-            logger.error(f"Microphone recording error: {e}")
+            logger.error(f"{label} recording error: {e}")
+
+        finally:
+            if writer:
+                writer.stop()
+
+    def get_capture_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Live overflow/underflow and dropped-sample counters per source"""
+        return {source: stats.to_dict() for source, stats in self.capture_stats.items()}
 
     def stop_recording(self) -> Optional[str]:
         """Stop recording and mix audio sources"""
@@ -173,75 +667,353 @@ class AudioRecorder:
             return None
 
         logger.info("Stopping audio recording...")
+        self.stop_time = time.monotonic()
         self.recording = False
+        self._stop_event.set()
 
         self.system_audio_thread.join()
         self.mic_audio_thread.join()
+        self.start_time = self._timeline_start()
+        self._discard_incomplete_encodes()
 
+        if self.segmented:
+            return self._finalize_segments()
         return self.mix_audio_sources()
 
+    def _discard_incomplete_encodes(self):
+        """Keep the raw WAV stem of any source whose encoder dropped audio"""
+        for source, encoder in self.stem_encoders.items():
+            if not encoder.complete and source in self.encoded_stem_files:
+                logger.warning(f"{source} {encoder.codec} stem is incomplete "
+                               f"({encoder.dropped_blocks} blocks dropped) - keeping the WAV stem")
+                path = self.encoded_stem_files.pop(source)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _timeline_start(self) -> Optional[float]:
+        """Monotonic capture time of the first frame of the mixed audio"""
+        sources = [source for source in ('system', 'mic') if len(self.timing_tracks.get(source, ())) >= 2]
+        if not sources:
+            return None
+
+        clocks = {source: fit_capture_clock(*self.timing_tracks[source].arrays()) for source in sources}
+        reference = sources[0]
+        if len(sources) == 1:
+            return clocks[reference][0]
+        # The mix starts at the aligned origin, which lies on the reference clock
+        offset, _ = estimate_alignment(clocks, reference)[reference]
+        ref_t0, ref_period = clocks[reference]
+        return ref_t0 + offset * ref_period
+
+    def _segment_frames(self) -> int:
+        """Frames per source in one recording segment"""
+        return int(config.segments.segment_minutes * 60 * config.audio.sample_rate)
+
+    def _on_segment_closed(self, source: str, index: int, path: str):
+        """Writer-thread callback: record the closed segment and let the mixer thread check for work"""
+        with self._segment_lock:
+            self.segment_files.setdefault(index, {})[source] = path
+            if self._open_segments.get(source, (None,))[0] == index:
+                del self._open_segments[source]
+        self._segment_mixer.submit(self._mix_ready_segments)
+
+    def _on_segment_progress(self, source: str, index: int, path: str):
+        """
+        Writer-thread callback: the open segment's header now covers more frames
+
+        A closed segment whose aligned frames reach into the next file can
+        only be mixed once enough of that file is on disk, so pending segments
+        are re-checked on every header patch rather than waiting a whole
+        segment for the next file to close.
+        """
+        with self._segment_lock:
+            if source not in self.segment_files.get(index, {}):
+                self._open_segments[source] = (index, path)
+            waiting = any(index not in self.mixed_segment_files for index in self.segment_files)
+        if waiting:
+            self._segment_mixer.submit(self._mix_ready_segments)
+
+    def _segment_sources_ordered(self) -> List[str]:
+        with self._segment_lock:
+            return [source for source in ('system', 'mic') if source in self._segment_sources]
+
+    def _source_segment_paths(self, source: str) -> List[str]:
+        """Closed segment files of one source, in order"""
+        with self._segment_lock:
+            return [self.segment_files[index][source] for index in sorted(self.segment_files)
+                    if source in self.segment_files[index]]
+
+    def _source_capture_paths(self, source: str) -> List[str]:
+        """Closed segment files of one source followed by the one still being written"""
+        paths = self._source_segment_paths(source)
+        with self._segment_lock:
+            index, path = self._open_segments.get(source, (None, None))
+        return paths + [path] if index == len(paths) else paths
+
+    def _mix_ready_segments(self, final: bool = False):
+        """
+        Mix, in order, every segment whose output frames can be rendered
+
+        Output segment k is frames [k * N, (k + 1) * N) of the aligned session
+        timeline. With a start offset or drift those frames map onto slightly
+        different source frames, which may lie in a neighbouring segment file,
+        so a segment is only mixed once every source has captured all the
+        frames it needs; frames already on disk in the open segment file
+        count, so this does not wait for the next segment to close. With
+        final=True everything left is mixed and the last segment runs to the
+        end of the longest source.
+        """
+        segment_frames = self._segment_frames()
+        try:
+            while True:
+                with self._segment_lock:
+                    pending = [index for index in sorted(self.segment_files) if index not in self.mixed_segment_files]
+                if not pending:
+                    return
+                index = pending[0]
+                names = self._segment_sources_ordered()
+                if not final and any(len(self._source_segment_paths(name)) <= index for name in names):
+                    return
+                paths = {name: self._source_capture_paths(name) for name in names}
+                names = [name for name in names if paths[name]]
+                # One fit per segment, so repeated readiness checks neither refit nor log again
+                if index not in self._segment_alignments:
+                    self._segment_alignments[index] = self._estimate_alignment(names) if len(names) > 1 else None
+                alignments = self._segment_alignments[index]
+
+                if not final:
+                    for name, (offset, ratio) in zip(names, alignments or [(0.0, 1.0)] * len(names)):
+                        # The last source frame read, and its neighbour when interpolating, must be captured
+                        position = offset + ratio * ((index + 1) * segment_frames - 1)
+                        needed = int(np.floor(position)) + (1 if position == int(position) else 2)
+                        captured = (len(paths[name]) - 1) * segment_frames + read_wav_info(paths[name][-1])['frames']
+                        if captured < needed:
+                            return
+
+                self._mix_segment(index, paths, names, alignments, last=final and index == pending[-1])
+
+        except Exception as e:
+            logger.error(f"Segment mixer error: {e}")
+
+    def _mix_segment(self, index: int, paths: Dict[str, List[str]], names: List[str],
+                     alignments: Optional[List[Tuple[float, float]]], last: bool = False):
+        """Mix output frames of one segment and hand them to the on_segment callback"""
+        segment_frames = self._segment_frames()
+        mixed_path = os.path.join(config.paths.temp_dir, f"mixed_{self.recording_timestamp}_seg{index:03d}.wav")
+        self.mixed_segment_files[index] = None
+
+        try:
+            whisper_path = None
+            transcription_writer = None
+            if config.audio.transcription_buffer:
+                whisper_path = os.path.join(config.paths.temp_dir, f"whisper_{self.recording_timestamp}_seg{index:03d}.f32")
+                self.segment_whisper_files[index] = whisper_path
+                transcription_writer = TranscriptionAudioWriter(whisper_path, config.audio.sample_rate)
+
+            sources = list(zip([paths[name] for name in names], self._source_gains(names)))
+            frame_range = (index * segment_frames, None if last else (index + 1) * segment_frames)
+            mix_wav_files(sources, mixed_path, alignments=alignments, frame_range=frame_range,
+                          block_callback=transcription_writer.write_block if transcription_writer else None)
+            if transcription_writer:
+                transcription_writer.close()
+
+            self.mixed_segment_files[index] = mixed_path
+            logger.info(f"Segment {index} mixed: {mixed_path}")
+
+            if self.on_segment:
+                start_seconds = index * config.segments.segment_minutes * 60
+                self.on_segment(index, start_seconds, mixed_path, whisper_path)
+
+        except Exception as e:
+            logger.error(f"Error mixing segment {index}: {e}")
+
+    def _finalize_segments(self) -> Optional[str]:
+        """Mix any leftover segments and join everything into full-session files"""
+        self._segment_mixer.shutdown(wait=True)
+        self._mix_ready_segments(final=True)
+
+        mixed = [self.mixed_segment_files[index] for index in sorted(self.mixed_segment_files)
+                 if self.mixed_segment_files[index]]
+        if not mixed:
+            logger.warning("No audio recorded!")
+            return None
+
+        try:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            mixed_filename = f"mixed_audio_{timestamp}{audio_extension(self.audio_codec)}"
+            concatenate_wav_files(mixed, mixed_filename, codec=self.audio_codec)
+            logger.info(f"✅ Joined {len(mixed)} segments into {mixed_filename}")
+
+            for source in self._segment_sources:
+                parts = self._source_segment_paths(source)
+                if source in self.encoded_stem_files:
+                    self.stem_files[source] = self.encoded_stem_files[source]
+                elif config.audio.keep_stems:
+                    stem_path = os.path.join(config.paths.temp_dir, f"{source}_{self.recording_timestamp}.wav")
+                    concatenate_wav_files(parts, stem_path)
+                    self.stem_files[source] = stem_path
+                for part in parts:
+                    os.remove(part)
+
+            if len(self._segment_sources) > 1:
+                self._estimate_alignment(self._segment_sources_ordered())
+
+            return mixed_filename
+
+        except Exception as e:
+            logger.error(f"Error joining segments: {e}")
+            return None
+
+    def _source_gains(self, names: List[str]) -> List[float]:
+        """Mix gains for the given sources; a lone source is kept at unity gain"""
+        if len(names) == 1:
+            return [1.0]
+        gains = {
+            'system': config.audio.system_audio_volume,
+            'mic': config.audio.microphone_volume * db_to_gain(-config.audio.microphone_reduction_db),
+        }
+        return [gains[name] for name in names]
+
     def mix_audio_sources(self) -> Optional[str]:
-        """Mix system audio and microphone into a single WAV file"""
+        """Mix system audio and microphone into a single audio file"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        mixed_filename = f"mixed_audio_{timestamp}.wav"
+        mixed_filename = f"mixed_audio_{timestamp}{audio_extension(self.audio_codec)}"
 
         try:
-            system_audio = None
-            mic_audio = None
-
-            if self.system_audio_frames:
-                logger.info("Processing system audio...")
-                with wave.open(f"temp_system_{timestamp}.wav", 'wb') as wf:
-                    wf.setnchannels(config.audio.channels)
-                    wf.setsampwidth(self.audio_interface.get_sample_size(pyaudio.paInt16))
-                    wf.setframerate(config.audio.sample_rate)
-                    wf.writeframes(b''.join(self.system_audio_frames))
-
-                system_audio = AudioSegment.from_wav(f"temp_system_{timestamp}.wav")
-                os.remove(f"temp_system_{timestamp}.wav")
-
-            if self.mic_audio_frames:
-                logger.info("Processing microphone audio...")
-                with wave.open(f"temp_mic_{timestamp}.wav", 'wb') as wf:
-                    wf.setnchannels(config.audio.channels)
-                    wf.setsampwidth(self.audio_interface.get_sample_size(pyaudio.paInt16))
-                    wf.setframerate(config.audio.sample_rate)
-                    wf.writeframes(b''.join(self.mic_audio_frames))
-
-                mic_audio = AudioSegment.from_wav(f"temp_mic_{timestamp}.wav")
-                os.remove(f"temp_mic_{timestamp}.wav")
-
-            if system_audio and mic_audio:
+            system_stem = self._get_stem('system', self.system_audio_frames)
+            mic_stem = self._get_stem('mic', self.mic_audio_frames)
+
+            if system_stem and mic_stem:
                 logger.info("Mixing system audio + microphone...")
-                min_length = min(len(system_audio), len(mic_audio))
-                system_audio = system_audio[:min_length]
-                mic_audio = mic_audio[:min_length]
-                mixed = system_audio.overlay(mic_audio - config.audio.microphone_reduction_db)
+                sources = list(zip([system_stem, mic_stem], self._source_gains(['system', 'mic'])))
+                alignments = self._estimate_alignment(['system', 'mic'])
 
-            elif system_audio:
+            elif system_stem:
                 logger.info("Using system audio only...")
-                mixed = system_audio
+                sources = [(system_stem, 1.0)]
+                alignments = None
 
-            elif mic_audio:
+            elif mic_stem:
                 logger.info("Using microphone only...")
-                mixed = mic_audio
+                sources = [(mic_stem, 1.0)]
+                alignments = None
 
             else:
                 logger.warning("No audio recorded!")
                 return None
 
-            mixed.export(mixed_filename, format="wav")
+            transcription_writer = None
+            stem_writers = {}
+            if config.audio.transcription_buffer:
+                self.transcription_audio_file = os.path.join(config.paths.temp_dir, f"whisper_{timestamp}.f32")
+                transcription_writer = TranscriptionAudioWriter(self.transcription_audio_file, config.audio.sample_rate)
+
+                if config.audio.keep_stems and len(sources) > 1:
+                    for source in ('system', 'mic'):
+                        path = os.path.join(config.paths.temp_dir, f"whisper_{source}_{timestamp}.f32")
+                        stem_writers[source] = TranscriptionAudioWriter(path, config.audio.sample_rate)
+                        self.stem_transcription_files[source] = path
+
+            frames = mix_wav_files(sources, mixed_filename, alignments=alignments,
+                                   block_callback=transcription_writer.write_block if transcription_writer else None,
+                                   source_callbacks=[stem_writers[source].write_block for source in ('system', 'mic')] if stem_writers else None,
+                                   codec=self.audio_codec)
+            if transcription_writer:
+                self.transcription_audio = transcription_writer.close()
+            for source, writer in stem_writers.items():
+                self.stem_transcription_audio[source] = writer.close()
+
+            if frames == 0:
+                logger.warning("No audio recorded!")
+                if os.path.exists(mixed_filename):
+                    os.remove(mixed_filename)
+                self.discard_transcription_audio()
+                return None
+
             logger.info(f"✅ Mixed audio saved as {mixed_filename}")
 
+            for source, stem_path in list(self.stem_files.items()):
+                # Encoded stems replace the raw WAV stems the mixer worked from
+                if not config.audio.keep_stems or source in self.encoded_stem_files:
+                    if os.path.exists(stem_path):
+                        os.remove(stem_path)
+                    self.stem_files.pop(source)
+            if config.audio.keep_stems:
+                self.stem_files.update(self.encoded_stem_files)
+
             return mixed_filename
 
         except Exception as e:
             logger.error(f"Error mixing audio: {e}")
             return None
 
+    def discard_transcription_audio(self):
+        """
+        Release the 16 kHz transcription buffers and delete their backing files
+
+        Segment buffers a SegmentPipeline never consumed (recording stopped
+        before its queue drained) are removed here too.
+        """
+        self.transcription_audio = None
+        self.stem_transcription_audio = {}
+        paths = [self.transcription_audio_file] + list(self.stem_transcription_files.values())
+        paths += list(self.mixed_segment_files.values()) + list(self.segment_whisper_files.values())
+        self.mixed_segment_files = {}
+        self.segment_whisper_files = {}
+        for path in paths:
+            if path and os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Could not delete {path}: {e}")
+        self.transcription_audio_file = None
+        self.stem_transcription_files = {}
+
+    def _estimate_alignment(self, sources: List[str]) -> Optional[List[Tuple[float, float]]]:
+        """Estimate per-source clock drift and start offset from chunk timestamps"""
+        self.alignment = {}
+        if any(len(self.timing_tracks.get(source, ())) < 2 for source in sources):
+            logger.warning("Not enough capture timestamps for drift correction - mixing unaligned")
+            return None
+
+        clocks = {source: fit_capture_clock(*self.timing_tracks[source].arrays()) for source in sources}
+        mapping = estimate_alignment(clocks, reference=sources[0])
+
+        for source, (offset, ratio) in mapping.items():
+            self.alignment[source] = {
+                'offset_frames': round(offset, 3),
+                'ratio': ratio,
+                'drift_ppm': round((ratio - 1) * 1e6, 2),
+            }
+            if source != sources[0]:
+                logger.info(f"Aligning {source}: offset {offset / config.audio.sample_rate * 1000:.1f} ms, "
+                            f"drift {(ratio - 1) * 1e6:+.1f} ppm")
+
+        return [mapping[source] for source in sources]
+
+    def _get_stem(self, source: str, frames: list) -> Optional[str]:
+        """Return the WAV stem for one source, writing in-memory frames to disk if needed"""
+        stem_path = self.stem_files.get(source)
+        if stem_path and os.path.exists(stem_path):
+            return stem_path
+
+        if not frames:
+            return None
+
+        stem_path = os.path.join(config.paths.temp_dir, f"{source}_{self.recording_timestamp}.wav")
+        writer = WavStreamWriter(stem_path, self.source_channels[source], config.audio.sample_rate)
+        for data in frames:
+            writer.write(data)
+        writer.close()
+
+        self.stem_files[source] = stem_path
+        return stem_path
+
     def cleanup(self):
         """Clean up resources"""
-        self.audio_interface.terminate()
+        if self._audio_interface is not None:
+            self._audio_interface.terminate()
+            self._audio_interface = None
 
 if __name__ == "__main__":
     recorder = AudioRecorder()
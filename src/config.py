@@ -16,13 +16,64 @@ class AudioConfig:
     system_audio_volume: float = 0.7
     microphone_volume: float = 0.3
     microphone_reduction_db: int = 6
+    streaming_capture: bool = True
+    capture_mode: str = "callback"
+    ring_buffer_seconds: float = 10.0
+    wav_header_interval: float = 2.0
+    mix_block_frames: int = 65536
+    transcription_buffer: bool = True
+    transcription_sample_rate: int = 16000
+    keep_stems: bool = True
+    codec: str = "flac"
+    opus_bitrate: str = "32k"
+    device_cache: bool = True
 
 @dataclass
 class VideoConfig:
     """Video recording configuration"""
     fps: int = 20
+    encoder: str = "ffmpeg"
+    x264_preset: str = "ultrafast"
+    x264_tune: Optional[str] = "stillimage"
+    crf: int = 23
+    keyframe_seconds: float = 2.0
     codec: str = "XVID"
     extension: str = "avi"
+    capture_backend: str = "auto"
+    replay_file: Optional[str] = None
+    frame_queue_size: int = 8
+    backpressure: str = "block"
+    static_detection: bool = True
+    static_tiles: int = 16
+    vfr: bool = True
+    output_scale: float = 1.0
+    auto_roi: bool = False
+    auto_roi_seconds: float = 3.0
+    proxy_enabled: bool = False
+    proxy_width: int = 640
+    proxy_fps: float = 5.0
+    proxy_crf: int = 30
+    mux_audio: bool = True
+    transcode_preset: str = "medium"
+    transcode_segment_seconds: float = 60.0
+
+@dataclass
+class SegmentConfig:
+    """Rolling segmented recording configuration"""
+    enabled: bool = False
+    segment_minutes: int = 5
+
+@dataclass
+class SlidesConfig:
+    """Slide extraction configuration"""
+    enabled: bool = False
+    sample_fps: float = 2.0
+    analysis_width: int = 256
+    analysis_height: int = 144
+    pixel_delta: int = 24
+    pixel_threshold: float = 0.01
+    hist_threshold: float = 0.05
+    min_slide_seconds: float = 2.0
 
 @dataclass
 class WhisperConfig:
@@ -30,6 +81,23 @@ class WhisperConfig:
     model_size: str = "base"
     language: Optional[str] = None
     task: str = "transcribe"
+    separate_speakers: bool = True
+    vad_enabled: bool = True
+    device: Optional[str] = None
+    precision: Optional[str] = None
+    model_memory_mb: int = 4096
+    parallel_chunks: bool = True
+    parallel_workers: Optional[int] = None
+    chunk_seconds: float = 300.0
+    chunk_overlap_seconds: float = 2.0
+    live_transcription: bool = False
+    live_window_seconds: float = 30.0
+    live_stride_seconds: float = 20.0
+    live_stall_seconds: float = 5.0
+    word_timestamps: bool = False
+    export_subtitles: bool = True
+    cache_enabled: bool = True
+    cache_max_mb: int = 512
 
 @dataclass
 class OllamaConfig:
@@ -44,10 +112,11 @@ class PathsConfig:
     sessions_dir: str = "sessions"
     ffmpeg_dir: str = "ffmpeg"
     temp_dir: str = "temp"
+    cache_dir: str = "cache"
 
     def __post_init__(self):
         """Create directories if they don't exist"""
-        for dir_path in [self.sessions_dir, self.temp_dir]:
+        for dir_path in [self.sessions_dir, self.temp_dir, self.cache_dir]:
             os.makedirs(dir_path, exist_ok=True)
 
 @dataclass
@@ -55,6 +124,8 @@ class Config:
     """Main configuration class"""
     audio: AudioConfig = AudioConfig()
     video: VideoConfig = VideoConfig()
+    segments: SegmentConfig = SegmentConfig()
+    slides: SlidesConfig = SlidesConfig()
     whisper: WhisperConfig = WhisperConfig()
     ollama: OllamaConfig = OllamaConfig()
     paths: PathsConfig = PathsConfig()
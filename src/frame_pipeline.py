@@ -0,0 +1,284 @@
+"""
+Producer/consumer pipeline between screen capture and video encoding
+"""
+
+import threading
+import time
+import zlib
+import numpy as np
+import queue
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from src.config import config
+from src.utils import setup_logging
+
+logger = setup_logging(level=config.log_level)
+
+BACKPRESSURE_POLICIES = ("block", "drop_oldest", "lower_fps")
+
+class FramePool:
+    """
+    Fixed set of preallocated frame buffers shared by the capture thread and encoders
+
+    Buffers are reference counted: a frame handed to several encoders returns
+    to the pool once the last of them releases it.
+    """
+    def __init__(self, count: int, shape: Tuple[int, ...]):
+        self._buffers = [np.empty(shape, dtype=np.uint8) for _ in range(count)]
+        self._free = queue.Queue()
+        self._refs = [0] * count
+        self._lock = threading.Lock()
+        for index in range(count):
+            self._free.put(index)
+
+    def acquire(self) -> Tuple[int, np.ndarray]:
+        """Take a free buffer, waiting for one if all are in flight"""
+        index = self._free.get()
+        return index, self._buffers[index]
+
+    def buffer(self, index: int) -> np.ndarray:
+        """The array behind a buffer index"""
+        return self._buffers[index]
+
+    def retain(self, index: int, count: int):
+        """Register count consumers of a buffer"""
+        with self._lock:
+            self._refs[index] += count
+        if count == 0:
+            self._free.put(index)
+
+    def release(self, index: int):
+        """Drop one consumer's hold on a buffer"""
+        with self._lock:
+            self._refs[index] -= 1
+            free = self._refs[index] == 0
+        if free:
+            self._free.put(index)
+
+class FrameChangeDetector:
+    """
+    Cheap static-screen detection from tiled frame checksums
+
+    The frame is split into horizontal bands and each band's crc32 is taken
+    in place, without copying or resizing, and compared with the previous
+    frame's. Checksumming at full resolution catches one-pixel changes such
+    as a moving cursor for roughly 3 ms per 1080p frame, well below the cost
+    of encoding it.
+    """
+    def __init__(self, tiles: Optional[int] = None):
+        self.tiles = tiles or config.video.static_tiles
+        self.changed_tiles = 0
+        self._last_checksums = None
+
+    def changed(self, frame: np.ndarray) -> bool:
+        """Whether the frame differs from the previous one passed in"""
+        band_rows = -(-frame.shape[0] // self.tiles)
+        checksums = [zlib.crc32(frame[start:start + band_rows]) for start in range(0, frame.shape[0], band_rows)]
+        if self._last_checksums is None or len(checksums) != len(self._last_checksums):
+            changed_tiles = len(checksums)
+        else:
+            changed_tiles = sum(a != b for a, b in zip(checksums, self._last_checksums))
+        self._last_checksums = checksums
+        self.changed_tiles = changed_tiles
+        return changed_tiles > 0
+
+@dataclass
+class _FrameItem:
+    """Queued frame: repeat the previous frame `repeats` times, then write `index` (if any)"""
+    index: Optional[int]
+    repeats: int = 0
+
+@dataclass
+class EncoderStats:
+    """Throughput counters of one encoder worker"""
+    frames_encoded: int = 0
+    frames_dropped: int = 0
+    encode_seconds: float = 0.0
+    max_queue_depth: int = 0
+    _depth_samples: int = 0
+    _depth_total: int = 0
+
+    def sample_depth(self, depth: int):
+        """Record the queue depth seen when a frame was enqueued"""
+        self._depth_samples += 1
+        self._depth_total += depth
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable snapshot without internal bookkeeping"""
+        stats = asdict(self)
+        stats.pop('_depth_samples')
+        stats.pop('_depth_total')
+        stats['encode_seconds'] = round(self.encode_seconds, 3)
+        stats['mean_queue_depth'] = round(self._depth_total / self._depth_samples, 2) if self._depth_samples else 0.0
+        stats['encoder_fps'] = round(self.frames_encoded / self.encode_seconds, 1) if self.encode_seconds else 0.0
+        return stats
+
+class EncoderWorker:
+    """
+    Drain one bounded frame queue into a write(frame, count, repeat) callable on its own thread
+
+    The worker holds on to the last frame it wrote so that later repeat
+    requests can be served without keeping a copy on the capture side.
+    """
+    def __init__(self, name: str, write: Callable[[np.ndarray, int, bool], None], pool: FramePool,
+                 queue_size: int, policy: str):
+        self.name = name
+        self.write = write
+        self.pool = pool
+        self.queue_size = queue_size
+        self.policy = policy
+        self.stats = EncoderStats()
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._last_index = None
+        self._thread = threading.Thread(target=self._encode_loop, name=f"{name}-encoder", daemon=True)
+
+    def start(self):
+        """Start the encoder thread"""
+        self._thread.start()
+
+    def depth(self) -> int:
+        """Number of frames waiting to be encoded"""
+        return len(self._queue)
+
+    def put(self, item: _FrameItem):
+        """Queue a frame, applying the backpressure policy when the queue is full"""
+        with self._condition:
+            if self.policy == "drop_oldest":
+                while len(self._queue) >= self.queue_size:
+                    self._drop_oldest(item)
+            else:
+                while len(self._queue) >= self.queue_size and not self._closed:
+                    self._condition.wait()
+
+            self._queue.append(item)
+            self.stats.sample_depth(len(self._queue))
+            self._condition.notify_all()
+
+    def _drop_oldest(self, incoming: _FrameItem):
+        """Discard the oldest queued frame; its slots become repeats so the timeline stays intact"""
+        dropped = self._queue.popleft()
+        successor = self._queue[0] if self._queue else incoming
+        successor.repeats += dropped.repeats + (1 if dropped.index is not None else 0)
+        if dropped.index is not None:
+            self.pool.release(dropped.index)
+            self.stats.frames_dropped += 1
+
+    def close(self):
+        """Encode everything still queued and stop the thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        if self._last_index is not None:
+            self.pool.release(self._last_index)
+            self._last_index = None
+
+    def _encode_loop(self):
+        """Encoder thread function"""
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                item = self._queue.popleft()
+                self._condition.notify_all()
+
+            started = time.perf_counter()
+            try:
+                if item.repeats and self._last_index is not None:
+                    self.write(self.pool.buffer(self._last_index), item.repeats, True)
+                if item.index is not None:
+                    self.write(self.pool.buffer(item.index), 1, False)
+            except Exception as e:
+                logger.error(f"{self.name} encoder error: {e}")
+            self.stats.encode_seconds += time.perf_counter() - started
+            self.stats.frames_encoded += item.repeats + (1 if item.index is not None else 0)
+
+            if item.index is not None:
+                if self._last_index is not None:
+                    self.pool.release(self._last_index)
+                self._last_index = item.index
+
+class FramePipeline:
+    """
+    Fan captured frames out to one or more encoder workers through bounded queues
+
+    Backpressure policies when an encoder falls behind:
+      block       - the capture thread waits for queue space
+      drop_oldest - the oldest queued frame is replaced by a repeat of its predecessor
+      lower_fps   - capture_stride grows so the capture thread grabs fewer frames
+    """
+    def __init__(self, frame_shape: Tuple[int, ...], encoders: List[Tuple[str, Callable[[np.ndarray, int, bool], None]]],
+                 queue_size: Optional[int] = None, policy: Optional[str] = None):
+        self.queue_size = queue_size or config.video.frame_queue_size
+        self.policy = policy or config.video.backpressure
+        if self.policy not in BACKPRESSURE_POLICIES:
+            logger.warning(f"Unknown backpressure policy '{self.policy}' - using block")
+            self.policy = "block"
+
+        # Per worker: every queued frame, the one being encoded and the last one
+        # kept for repeats; plus the frame being captured
+        self.pool = FramePool(len(encoders) * (self.queue_size + 2) + 1, frame_shape)
+        self.workers = [EncoderWorker(name, write, self.pool, self.queue_size, self.policy)
+                        for name, write in encoders]
+        self.capture_stride = 1
+        self.max_capture_stride = 8
+        self.stride_changes = 0
+
+    def start(self):
+        """Start all encoder workers"""
+        for worker in self.workers:
+            worker.start()
+
+    def acquire(self) -> Tuple[int, np.ndarray]:
+        """Get a free buffer to capture the next frame into"""
+        return self.pool.acquire()
+
+    def submit(self, index: int, repeats: int = 0):
+        """Hand a captured buffer to every encoder, preceded by repeats of the previous frame"""
+        self.pool.retain(index, len(self.workers))
+        for worker in self.workers:
+            worker.put(_FrameItem(index, repeats))
+        if self.policy == "lower_fps":
+            self._adjust_stride()
+
+    def discard(self, index: int):
+        """Return a captured buffer to the pool without encoding it"""
+        self.pool.retain(index, 0)
+
+    def repeat(self, repeats: int):
+        """Ask every encoder to write its last frame again"""
+        if repeats:
+            for worker in self.workers:
+                worker.put(_FrameItem(None, repeats))
+
+    def _adjust_stride(self):
+        """Halve or double the capture rate based on the fullest encoder queue"""
+        depth = max(worker.depth() for worker in self.workers)
+        if depth >= self.queue_size * 3 // 4 and self.capture_stride < self.max_capture_stride:
+            self.capture_stride *= 2
+            self.stride_changes += 1
+            logger.warning(f"Encoder falling behind - capturing every {self.capture_stride} frames")
+        elif depth <= self.queue_size // 4 and self.capture_stride > 1:
+            self.capture_stride //= 2
+            self.stride_changes += 1
+
+    def stop(self):
+        """Drain all queues and stop the workers"""
+        for worker in self.workers:
+            worker.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth and throughput metrics per encoder"""
+        return {
+            'policy': self.policy,
+            'queue_size': self.queue_size,
+            'capture_stride': self.capture_stride,
+            'stride_changes': self.stride_changes,
+            'encoders': {worker.name: worker.stats.to_dict() for worker in self.workers},
+        }
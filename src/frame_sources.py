@@ -0,0 +1,269 @@
+"""
+Screen frame sources for video recording
+"""
+
+import cv2
+import numpy as np
+import time
+from array import array
+from typing import Any, Dict, Optional, Tuple
+from src.config import config
+from src.utils import setup_logging
+
+logger = setup_logging(level=config.log_level)
+
+class GrabStats:
+    """Per-frame grab latency of a frame source"""
+    def __init__(self):
+        self._latencies = array('d')
+
+    def record(self, seconds: float):
+        """Account for one grabbed frame"""
+        self._latencies.append(seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable latency summary in milliseconds"""
+        count = len(self._latencies)
+        if not count:
+            return {'frames': 0}
+        latencies = np.array(self._latencies[:count]) * 1000
+        return {
+            'frames': count,
+            'mean_ms': round(float(latencies.mean()), 2),
+            'p95_ms': round(float(np.percentile(latencies, 95)), 2),
+            'max_ms': round(float(latencies.max()), 2),
+        }
+
+class FrameSource:
+    """
+    Base class for anything that produces BGR frames of a fixed size
+
+    grab() writes into the caller's buffer when one is given; otherwise it
+    returns a buffer owned by the source that is reused for the next frame,
+    so callers must finish with it (or copy it) first.
+    """
+    name = "base"
+
+    def __init__(self, region: Tuple[int, int, int, int]):
+        self.region = region
+        self.size = (region[2], region[3])
+        self.stats = GrabStats()
+        self._frame = np.empty((region[3], region[2], 3), dtype=np.uint8)
+
+    def grab(self, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Capture one frame and record how long it took"""
+        started = time.perf_counter()
+        frame = self._grab(self._frame if out is None else out)
+        self.stats.record(time.perf_counter() - started)
+        return frame
+
+    def _grab(self, frame: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def close(self):
+        """Release backend resources"""
+        pass
+
+class MssFrameSource(FrameSource):
+    """
+    Grab the screen with mss (native X11/GDI/Quartz calls) without a PIL round-trip
+
+    The BGRA pixels are wrapped without copying and converted straight into
+    the reused BGR frame buffer. The mss handle is created on first grab,
+    because it must live on the thread that uses it.
+    """
+    name = "mss"
+
+    def __init__(self, region: Tuple[int, int, int, int]):
+        import mss
+        super().__init__(region)
+        self._mss = mss
+        self._sct = None
+        x, y, width, height = region
+        self._monitor = {'left': x, 'top': y, 'width': width, 'height': height}
+
+    def _grab(self, frame: np.ndarray) -> np.ndarray:
+        if self._sct is None:
+            self._sct = self._mss.mss()
+        shot = self._sct.grab(self._monitor)
+        bgra = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+        cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=frame)
+        return frame
+
+    def close(self):
+        if self._sct is not None:
+            self._sct.close()
+            self._sct = None
+
+class PyAutoGUIFrameSource(FrameSource):
+    """Portable fallback that goes through pyautogui/PIL screenshots"""
+    name = "pyautogui"
+
+    def __init__(self, region: Tuple[int, int, int, int]):
+        import pyautogui
+        super().__init__(region)
+        self._pyautogui = pyautogui
+
+    def _grab(self, frame: np.ndarray) -> np.ndarray:
+        screenshot = self._pyautogui.screenshot(region=self.region)
+        cv2.cvtColor(np.asarray(screenshot), cv2.COLOR_RGB2BGR, dst=frame)
+        return frame
+
+class SyntheticFrameSource(FrameSource):
+    """Deterministic moving test pattern for headless runs and benchmarks"""
+    name = "synthetic"
+
+    def __init__(self, region: Tuple[int, int, int, int]):
+        super().__init__(region)
+        width, height = self.size
+        self._gradient = np.add.outer(np.arange(height) // 4, np.arange(width) // 4).astype(np.uint8)
+        self.frame_index = 0
+
+    def _grab(self, frame: np.ndarray) -> np.ndarray:
+        shift = self.frame_index * 4
+        np.add(self._gradient, np.uint8(shift % 256), out=frame[:, :, 0])
+        frame[:, :, 1] = self._gradient
+        frame[:, :, 2] = shift % 256
+        self.frame_index += 1
+        return frame
+
+class ReplayFrameSource(FrameSource):
+    """Loop the frames of an existing video file, resized to the recording size"""
+    name = "replay"
+
+    def __init__(self, region: Tuple[int, int, int, int], path: str):
+        super().__init__(region)
+        self.path = path
+        self._capture = cv2.VideoCapture(path)
+        if not self._capture.isOpened():
+            raise ValueError(f"Cannot open replay video: {path}")
+        self._decoded = None
+
+    def _grab(self, frame: np.ndarray) -> np.ndarray:
+        ok, self._decoded = self._capture.read(self._decoded)
+        if not ok:
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, self._decoded = self._capture.read(self._decoded)
+            if not ok:
+                raise ValueError(f"Replay video has no frames: {self.path}")
+
+        if self._decoded.shape[:2] == frame.shape[:2]:
+            np.copyto(frame, self._decoded)
+        else:
+            cv2.resize(self._decoded, self.size, dst=frame, interpolation=cv2.INTER_AREA)
+        return frame
+
+    def close(self):
+        self._capture.release()
+
+def _mask_box(mask: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+    """(x0, y0, x1, y1) around the set cells of a mask"""
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if not len(rows):
+        return None
+    return (int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1)
+
+def _enclosing_window(gray: np.ndarray, box: Tuple[int, int, int, int]) -> Tuple[int, int, int, int]:
+    """Smallest outlined rectangle (e.g. a window frame) around box, or box itself"""
+    x0, y0, x1, y1 = box
+    contours = cv2.findContours(cv2.Canny(gray, 50, 150), cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)[-2]
+    best = box
+    best_area = None
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if x <= x0 and y <= y0 and x + w >= x1 and y + h >= y1 and (best_area is None or w * h < best_area):
+            best, best_area = (x, y, x + w, y + h), w * h
+    return best
+
+def detect_active_region(source: FrameSource, seconds: float, sample_fps: float = 5.0,
+                         margin: int = 16) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Find the part of the capture area worth recording
+
+    Frames are sampled for the given time on a 1/4-scale grayscale copy.
+    Whatever changed is grown to the smallest outlined rectangle around it,
+    usually the active window. If nothing moved, the box of everything that
+    differs from the border colour (e.g. a slide between black bars) is used
+    instead. Returns (x, y, width, height) relative to the source region, or
+    None when the result would be (nearly) the whole area or implausibly small.
+    """
+    step = 4
+    width, height = source.size
+    small_size = (max(1, width // step), max(1, height // step))
+    previous = None
+    activity = np.zeros((small_size[1], small_size[0]), dtype=bool)
+
+    deadline = time.monotonic() + seconds
+    while True:
+        small = cv2.cvtColor(cv2.resize(source.grab(), small_size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        if previous is not None:
+            activity |= cv2.absdiff(small, previous) > 8
+        previous = small
+        if time.monotonic() >= deadline:
+            break
+        time.sleep(1.0 / sample_fps)
+
+    box = _mask_box(activity)
+    if box is not None:
+        box = _enclosing_window(previous, box)
+    else:
+        border = np.concatenate([previous[0], previous[-1], previous[:, 0], previous[:, -1]])
+        box = _mask_box(np.abs(previous.astype(np.int16) - int(np.median(border))) > 8)
+    if box is None:
+        return None
+
+    x0, y0 = max(0, box[0] * step - margin), max(0, box[1] * step - margin)
+    x1, y1 = min(width, box[2] * step + margin), min(height, box[3] * step + margin)
+    area = (x1 - x0) * (y1 - y0)
+    if area >= 0.9 * width * height or area < 0.02 * width * height:
+        return None
+    return (x0, y0, x1 - x0, y1 - y0)
+
+# Canvas size used by the synthetic/replay sources when no region is given
+HEADLESS_SCREEN_SIZE = (1280, 720)
+
+def get_screen_size(backend: Optional[str] = None) -> Tuple[int, int]:
+    """Size of the primary screen as seen by the configured backend"""
+    backend = (backend or config.video.capture_backend).lower()
+    if backend in ("synthetic", "replay"):
+        return HEADLESS_SCREEN_SIZE
+
+    if backend != "pyautogui":
+        try:
+            import mss
+            with mss.mss() as sct:
+                monitor = sct.monitors[1]
+                return (monitor['width'], monitor['height'])
+        except ImportError:
+            pass
+
+    import pyautogui
+    width, height = pyautogui.size()
+    return (width, height)
+
+def create_frame_source(region: Tuple[int, int, int, int], backend: Optional[str] = None) -> FrameSource:
+    """
+    Build the configured frame source for a capture region
+
+    "auto" prefers mss and falls back to pyautogui when mss is not installed.
+    """
+    backend = (backend or config.video.capture_backend).lower()
+    if backend not in ("auto", "mss", "pyautogui", "synthetic", "replay"):
+        logger.warning(f"Unknown capture backend '{backend}' - using auto")
+        backend = "auto"
+
+    if backend == "synthetic":
+        return SyntheticFrameSource(region)
+    if backend == "replay":
+        return ReplayFrameSource(region, config.video.replay_file)
+    if backend == "pyautogui":
+        return PyAutoGUIFrameSource(region)
+
+    try:
+        return MssFrameSource(region)
+    except ImportError:
+        if backend == "mss":
+            raise
+        logger.warning("mss not installed - falling back to pyautogui screenshots (pip install mss)")
+        return PyAutoGUIFrameSource(region)
@@ -0,0 +1,291 @@
+"""
+Live transcription of audio while it is being recorded
+"""
+
+import threading
+import numpy as np
+from typing import Dict, List, Optional
+from src.config import config
+from src.utils import setup_logging
+from src.audio_io import TimingTrack
+from src.audio_processing import PolyphaseResampler, fit_capture_clock
+from src.transcription import Transcriber, WHISPER_SAMPLE_RATE
+
+logger = setup_logging(level=config.log_level)
+
+ALIGN_TOLERANCE_SECONDS = 0.02
+REFIT_SECONDS = 10.0
+
+class LiveAudioBuffer:
+    """
+    Growing 16 kHz mono audio per source, readable as a mix while still being written
+
+    Sample positions are absolute from origin, the capture time of the first
+    placed audio; audio the consumer no longer needs is released with
+    discard_before(). An open source more than stall_seconds behind the
+    furthest one no longer holds the mix back: it is read as silence until
+    it catches up.
+    """
+    def __init__(self, stall_seconds: Optional[float] = None):
+        self.stall = int((stall_seconds or config.whisper.live_stall_seconds) * WHISPER_SAMPLE_RATE)
+        self.origin: Optional[float] = None
+        self._blocks: Dict[str, List[np.ndarray]] = {}
+        self._block_starts: Dict[str, List[int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._closed = set()
+        self._stalled = set()
+        self._condition = threading.Condition()
+
+    def add_source(self, source: str):
+        """Register a source; the mix is only available as far as every source has been written"""
+        with self._condition:
+            self._blocks[source] = []
+            self._block_starts[source] = []
+            self._lengths[source] = 0
+
+    def anchor(self, timestamp: float) -> float:
+        """Monotonic capture time of sample 0, fixed by the first source to ask"""
+        with self._condition:
+            if self.origin is None:
+                self.origin = timestamp
+            return self.origin
+
+    def append(self, source: str, samples: np.ndarray, start: Optional[int] = None):
+        """
+        Add samples to a source at position start (default: its end)
+
+        A start past the end leaves a silent gap; samples before the end
+        overlap audio already written and are dropped.
+        """
+        with self._condition:
+            length = self._lengths[source]
+            if start is None:
+                start = length
+            if start < length:
+                samples = samples[length - start:]
+                start = length
+            if not len(samples):
+                return
+            self._blocks[source].append(samples.astype(np.float32, copy=False))
+            self._block_starts[source].append(start)
+            self._lengths[source] = start + len(samples)
+            self._condition.notify_all()
+
+    def close(self, source: str):
+        """Mark a source as complete"""
+        with self._condition:
+            self._closed.add(source)
+            self._condition.notify_all()
+
+    def _readable(self) -> int:
+        """Mix length covered by every open source that is not stalled; caller holds the lock"""
+        if not self._lengths:
+            return 0
+        furthest = max(self._lengths.values())
+        pending = {source: length for source, length in self._lengths.items() if source not in self._closed}
+        stalled = {source for source, length in pending.items() if furthest - length > self.stall}
+        for source in sorted(stalled - self._stalled):
+            logger.warning(f"Live transcription: {source} is {(furthest - pending[source]) / WHISPER_SAMPLE_RATE:.1f}s "
+                           f"behind - mixing it as silence")
+        for source in sorted(self._stalled - stalled):
+            logger.info(f"Live transcription: {source} caught up")
+        self._stalled = stalled
+        return min((length for source, length in pending.items() if source not in stalled), default=furthest)
+
+    def available(self) -> int:
+        """Number of samples readable from the mix"""
+        with self._condition:
+            return self._readable()
+
+    def finished(self) -> bool:
+        """Whether every source has been closed"""
+        with self._condition:
+            return bool(self._lengths) and self._closed >= set(self._lengths)
+
+    def wait(self, samples: int, timeout: float = 1.0):
+        """Block until the mix reaches the given length, all sources close or the timeout passes"""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._readable() >= samples or (self._lengths and self._closed >= set(self._lengths)),
+                timeout=timeout
+            )
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """Sum of all sources over [start, end), clipped to [-1, 1]"""
+        mix = np.zeros(max(0, end - start), dtype=np.float32)
+        with self._condition:
+            for source, blocks in self._blocks.items():
+                for block_start, block in zip(self._block_starts[source], blocks):
+                    lo, hi = max(start, block_start), min(end, block_start + len(block))
+                    if lo < hi:
+                        mix[lo - start:hi - start] += block[lo - block_start:hi - block_start]
+        return np.clip(mix, -1.0, 1.0, out=mix)
+
+    def discard_before(self, position: int):
+        """Release blocks that end before the given sample position"""
+        with self._condition:
+            for source, blocks in self._blocks.items():
+                starts = self._block_starts[source]
+                while blocks and starts[0] + len(blocks[0]) <= position:
+                    blocks.pop(0)
+                    starts.pop(0)
+
+class LiveTapSink:
+    """
+    CaptureWriter sink that downmixes and resamples one source into a LiveAudioBuffer
+
+    With the source's TimingTrack, audio is placed on the shared capture
+    timeline: the clock fit (refreshed every REFIT_SECONDS) gives the start
+    offset and drift, and once the placement is off by more than
+    ALIGN_TOLERANCE_SECONDS it is corrected by leaving a gap or dropping
+    overlapping samples. Without one, blocks are appended back to back.
+    """
+    def __init__(self, buffer: LiveAudioBuffer, source: str, channels: int, sample_rate: int,
+                 timing: Optional[TimingTrack] = None):
+        self.buffer = buffer
+        self.source = source
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.timing = timing
+        self.resampler = PolyphaseResampler(sample_rate, WHISPER_SAMPLE_RATE)
+        self._frames_in = 0
+        self._emitted = 0
+        self._shift = 0
+        self._next_fit = 0
+        buffer.add_source(source)
+
+    def write(self, data: bytes):
+        block = np.frombuffer(data, dtype=np.int16).reshape(-1, self.channels)
+        self._frames_in += len(block)
+        self._append(self.resampler.process(block.mean(axis=1) / 32768.0))
+
+    def close(self):
+        self._append(self.resampler.flush())
+        self.buffer.close(self.source)
+
+    def _append(self, samples: np.ndarray):
+        if self.timing is not None and self._frames_in >= self._next_fit:
+            self._align()
+        self.buffer.append(self.source, samples, self._emitted + self._shift)
+        self._emitted += len(samples)
+
+    def _align(self):
+        """Refit the capture clock and move the placement if it has drifted off"""
+        if not len(self.timing):
+            return
+        frames, times = self.timing.arrays()
+        if len(times) >= 2:
+            t0, period = fit_capture_clock(frames, times)
+        else:
+            t0, period = float(times[0]), 1.0 / self.sample_rate
+        origin = self.buffer.anchor(t0)
+
+        captured_at = t0 + period * self._emitted * self.sample_rate / WHISPER_SAMPLE_RATE
+        target = int(round((captured_at - origin) * WHISPER_SAMPLE_RATE))
+        if abs(target - (self._emitted + self._shift)) >= ALIGN_TOLERANCE_SECONDS * WHISPER_SAMPLE_RATE:
+            self._shift = target - self._emitted
+        self._next_fit = self._frames_in + int(REFIT_SECONDS * self.sample_rate)
+
+class LiveTranscriber:
+    """
+    Transcribe fixed windows of the recording on a consumer thread while it runs
+
+    Each window starts where the last committed segment ended and is decoded
+    with the preceding transcript as prompt. Segments ending within the first
+    stride_seconds of a window are final: the next window starts after them,
+    so they are appended to the transcript file right away. After the
+    recording stops only the audio since the last commit is left to decode.
+    """
+    def __init__(self, transcriber: Transcriber, output_file: str, window_seconds: Optional[float] = None,
+                 stride_seconds: Optional[float] = None):
+        self.transcriber = transcriber
+        self.output_file = output_file
+        self.window = int((window_seconds or config.whisper.live_window_seconds) * WHISPER_SAMPLE_RATE)
+        self.stride = int((stride_seconds or config.whisper.live_stride_seconds) * WHISPER_SAMPLE_RATE)
+        self.buffer = LiveAudioBuffer()
+        self.segments: List[Dict] = []
+        self.windows_decoded = 0
+        self._position = 0
+        self._stopping = False
+        self._file = open(output_file, 'w', encoding='utf-8')
+        self._thread = threading.Thread(target=self._worker, name="live-transcription", daemon=True)
+
+    def sink(self, source: str, channels: int, sample_rate: int,
+             timing: Optional[TimingTrack] = None) -> LiveTapSink:
+        """Create the CaptureWriter sink that feeds one source into the live mix"""
+        return LiveTapSink(self.buffer, source, channels, sample_rate, timing)
+
+    def start(self):
+        """Start the consumer thread"""
+        self._thread.start()
+
+    def _worker(self):
+        """Consumer thread function"""
+        while True:
+            end = self._position + self.window
+            self.buffer.wait(end)
+            if self.buffer.available() >= end:
+                try:
+                    self._decode(end, final=False)
+                except Exception as e:
+                    logger.error(f"Live transcription error: {e}")
+                    self._position += self.stride
+            elif self.buffer.finished() or self._stopping:
+                break
+
+        # Remaining tail after the recording stopped, in as many windows as needed
+        try:
+            while self.buffer.available() - self._position > self.window:
+                self._decode(self._position + self.window, final=False)
+            if self.buffer.available() > self._position:
+                self._decode(self.buffer.available(), final=True)
+        except Exception as e:
+            logger.error(f"Live transcription error: {e}")
+
+    def _decode(self, end: int, final: bool):
+        """Transcribe [position, end) and commit the segments that no later window will revisit"""
+        start = self._position
+        offset = start / WHISPER_SAMPLE_RATE
+        prompt = ''.join(segment['text'] for segment in self.segments)[-800:].strip()
+        result = self.transcriber.transcribe_window(self.buffer.read(start, end), initial_prompt=prompt or None)
+        self.windows_decoded += 1
+
+        segments = []
+        for segment in result.get('segments', []):
+            if not segment['text'].strip():
+                continue
+            segment = dict(segment, start=round(segment['start'] + offset, 3), end=round(segment['end'] + offset, 3))
+            if segment.get('words'):
+                segment['words'] = [dict(word, start=round(word['start'] + offset, 3), end=round(word['end'] + offset, 3))
+                                    for word in segment['words']]
+            segments.append(segment)
+        if final:
+            stable = segments
+        else:
+            stride_end = offset + self.stride / WHISPER_SAMPLE_RATE
+            stable = [segment for segment in segments if segment['end'] <= stride_end]
+            if not stable and segments and segments[0]['start'] < stride_end:
+                # A single long segment spans the stride point: take it rather than stall
+                stable = segments[:1]
+
+        for segment in stable:
+            self._file.write(segment['text'])
+        self._file.flush()
+        self.segments.extend(stable)
+
+        if stable and not final:
+            self._position = max(int(stable[-1]['end'] * WHISPER_SAMPLE_RATE), start + WHISPER_SAMPLE_RATE)
+        else:
+            self._position = start + self.stride if not final else end
+        self.buffer.discard_before(self._position)
+
+    def finish(self) -> Optional[str]:
+        """Decode the audio still pending after the recording stopped and close the transcript"""
+        self._stopping = True
+        self._thread.join()
+        self._file.close()
+        logger.info(f"Live transcript: {len(self.segments)} segments from {self.windows_decoded} windows")
+        if not self.segments:
+            logger.warning("Live transcription produced no text")
+            return None
+        return self.output_file
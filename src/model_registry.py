@@ -0,0 +1,162 @@
+"""
+Process-wide cache of loaded Whisper models
+"""
+
+import threading
+import time
+import whisper
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from src.config import config
+from src.utils import setup_logging
+
+logger = setup_logging(level=config.log_level)
+
+ModelKey = Tuple[str, str, str]
+
+def resolve_device(device: Optional[str] = None) -> str:
+    """Configured device, or CUDA when available"""
+    device = device or config.whisper.device
+    if device:
+        return device
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+_warned_cpu_fp16 = False
+
+def resolve_precision(device: str, precision: Optional[str] = None) -> str:
+    """
+    Configured precision; fp16 by default on GPUs, where Whisper would use it anyway
+
+    fp16 is only honoured on CUDA: Whisper always decodes in fp32 on the CPU,
+    so a half-precision model there fails with a dtype mismatch.
+    """
+    global _warned_cpu_fp16
+    precision = precision or config.whisper.precision
+    if precision == "fp16" and not device.startswith("cuda"):
+        if not _warned_cpu_fp16:
+            logger.warning(f"fp16 is not supported on {device} - using fp32")
+            _warned_cpu_fp16 = True
+        return "fp32"
+    if precision:
+        return precision
+    return "fp16" if device.startswith("cuda") else "fp32"
+
+# Approximate fp32 weight size of each Whisper model family, for planning before loading
+WHISPER_MODEL_MB = {'tiny': 150, 'base': 290, 'small': 970, 'medium': 3050, 'large': 6150, 'turbo': 3200}
+
+def estimated_model_mb(size: str) -> float:
+    """Expected memory of a Whisper model size ("medium.en", "large-v3", ...) before loading it"""
+    family = size.split('.')[0].split('-')[0]
+    return WHISPER_MODEL_MB.get(family, WHISPER_MODEL_MB['large'])
+
+def model_memory_mb(model) -> float:
+    """Memory held by a model's parameters and buffers"""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors) / (1024 * 1024)
+
+class ModelRegistry:
+    """
+    Lazily loaded Whisper models keyed by (size, device, precision)
+
+    Models stay resident after use and the least recently used ones are
+    evicted once their combined size exceeds the memory budget; the model
+    being requested is never evicted. Concurrent requests for a model that
+    is still loading wait for that load instead of starting another one.
+    """
+    def __init__(self, memory_budget_mb: Optional[float] = None):
+        self.memory_budget_mb = memory_budget_mb or config.whisper.model_memory_mb
+        self._models: "OrderedDict[ModelKey, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: Dict[ModelKey, threading.Lock] = {}
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def key(self, size: Optional[str] = None, device: Optional[str] = None,
+            precision: Optional[str] = None) -> ModelKey:
+        """Resolve defaults into a cache key"""
+        device = resolve_device(device)
+        return (size or config.whisper.model_size, device, resolve_precision(device, precision))
+
+    def get(self, size: Optional[str] = None, device: Optional[str] = None, precision: Optional[str] = None):
+        """Return a loaded model, loading it on first use"""
+        key = self.key(size, device, precision)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return self._models[key][0]
+            load_lock = self._loading.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    self.hits += 1
+                    return self._models[key][0]
+
+            model = self._load(key)
+            with self._lock:
+                self._models[key] = (model, model_memory_mb(model))
+                self._loading.pop(key, None)
+                self._evict(keep=key)
+            return model
+
+    def _load(self, key: ModelKey):
+        """Load one model onto its device at its precision"""
+        size, device, precision = key
+        started = time.perf_counter()
+        model = whisper.load_model(size, device=device)
+        if precision == "fp16":
+            model = model.half()
+        self.loads += 1
+        logger.info(f"Loaded Whisper {size} on {device} ({precision}) in {time.perf_counter() - started:.1f}s")
+        return model
+
+    def _evict(self, keep: ModelKey):
+        """Drop least recently used models until the budget is met (caller holds the lock)"""
+        while self.resident_mb() > self.memory_budget_mb and len(self._models) > 1:
+            key = next(k for k in self._models if k != keep)
+            self._models.pop(key)
+            self.evictions += 1
+            logger.info(f"Evicted Whisper {key[0]} ({key[1]}, {key[2]}) to stay within {self.memory_budget_mb:.0f} MB")
+            if key[1].startswith("cuda"):
+                import torch
+                torch.cuda.empty_cache()
+
+    def warm_up(self, size: Optional[str] = None, device: Optional[str] = None,
+                precision: Optional[str] = None) -> threading.Thread:
+        """Load a model on a background thread so it is resident when first needed"""
+        def load():
+            try:
+                self.get(size, device, precision)
+            except Exception as e:
+                logger.error(f"Whisper warm-up failed: {e}")
+
+        thread = threading.Thread(target=load, name="whisper-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def resident_mb(self) -> float:
+        """Combined size of all loaded models"""
+        return sum(size_mb for _, size_mb in self._models.values())
+
+    def clear(self):
+        """Unload every model"""
+        with self._lock:
+            self._models.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache contents and hit/load/eviction counters"""
+        with self._lock:
+            return {
+                'models': [f"{size}/{device}/{precision}" for size, device, precision in self._models],
+                'resident_mb': round(self.resident_mb(), 1),
+                'memory_budget_mb': self.memory_budget_mb,
+                'loads': self.loads,
+                'hits': self.hits,
+                'evictions': self.evictions,
+            }
+
+registry = ModelRegistry()
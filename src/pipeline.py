@@ -0,0 +1,91 @@
+"""
+Pipelined processing of segmented recordings
+"""
+
+import os
+import queue
+import threading
+from typing import Dict, List, Optional
+from src.config import config
+from src.utils import setup_logging
+from src.transcription import Transcriber, load_worker_audio
+
+logger = setup_logging(level=config.log_level)
+
+class SegmentPipeline:
+    """
+    Background transcription of completed recording segments
+
+    Segments are transcribed in arrival order on a worker thread while the
+    recording continues, so only the last segment is left when it stops.
+    """
+
+    def __init__(self, transcriber: Transcriber):
+        self.transcriber = transcriber
+        self.results: Dict[int, Dict] = {}
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._worker, name="segment-pipeline", daemon=True)
+        self._thread.start()
+
+    def submit(self, index: int, start_seconds: float, audio_file: str, whisper_file: Optional[str] = None):
+        """Queue a finished segment; matches AudioRecorder's on_segment callback"""
+        logger.info(f"Segment {index} queued for transcription (starts at {start_seconds:.0f}s)")
+        self._queue.put((index, start_seconds, audio_file, whisper_file))
+
+    def _worker(self):
+        """Transcription thread function"""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+
+            index, start_seconds, audio_file, whisper_file = job
+            audio = result = None
+            try:
+                audio = load_worker_audio(whisper_file) if whisper_file else None
+                result = self.transcriber.transcribe_result(audio_file, audio)
+                if result is not None:
+                    for segment in result.get('segments', []):
+                        segment['start'] += start_seconds
+                        segment['end'] += start_seconds
+                        for word in segment.get('words', []) or []:
+                            word['start'] += start_seconds
+                            word['end'] += start_seconds
+                    self.results[index] = result
+                    logger.info(f"Segment {index} transcribed")
+            except Exception as e:
+                logger.error(f"Segment {index} transcription error: {e}")
+            finally:
+                # Drop the memmap before deleting its file (Windows refuses to delete mapped files)
+                del audio, result
+                if whisper_file and os.path.exists(whisper_file):
+                    try:
+                        os.remove(whisper_file)
+                    except OSError as e:
+                        logger.warning(f"Could not delete segment {index} audio: {e}")
+
+    @property
+    def segments(self) -> List[Dict]:
+        """Timed segments of every transcribed recording segment on the session timeline"""
+        return [segment for index in sorted(self.results) for segment in self.results[index].get('segments', [])]
+
+    def finish(self, output_file: str) -> Optional[str]:
+        """Wait for the remaining segments and write the combined transcript"""
+        self._queue.put(None)
+        self._thread.join()
+
+        if not self.results:
+            logger.warning("No segments were transcribed")
+            return None
+
+        try:
+            transcript = " ".join(self.results[index].get('text', '').strip() for index in sorted(self.results))
+            with open(output_file, "w", encoding="utf-8") as f:
+                f.write(transcript)
+
+            logger.info(f"Transcript of {len(self.results)} segments saved: {output_file}")
+            return output_file
+
+        except Exception as e:
+            logger.error(f"Error writing segment transcript: {e}")
+            return None
@@ -0,0 +1,120 @@
+"""
+Timed transcript segments: compact JSON, SRT/VTT subtitles and loading
+"""
+
+import json
+import os
+from typing import Dict, List, Optional
+from src.config import config
+from src.utils import setup_logging
+
+logger = setup_logging(level=config.log_level)
+
+SEGMENTS_VERSION = 1
+
+def compact_segment(segment: Dict, index: int) -> Dict:
+    """Keep the fields worth storing from a Whisper segment, with times rounded to milliseconds"""
+    compact = {
+        'id': index,
+        'start': round(float(segment['start']), 3),
+        'end': round(float(segment['end']), 3),
+        'text': segment['text'].strip(),
+    }
+    if segment.get('speaker'):
+        compact['speaker'] = segment['speaker']
+    if segment.get('words'):
+        compact['words'] = [
+            {
+                'word': word['word'],
+                'start': round(float(word['start']), 3),
+                'end': round(float(word['end']), 3),
+                'probability': round(float(word.get('probability', 0.0)), 3),
+            }
+            for word in segment['words']
+        ]
+    return compact
+
+def format_subtitle_timestamp(seconds: float, separator: str = ',') -> str:
+    """Format seconds as HH:MM:SS,mmm (SRT) or HH:MM:SS.mmm (VTT)"""
+    milliseconds = int(round(max(seconds, 0.0) * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{milliseconds:03d}"
+
+def write_segments_json(segments: List[Dict], path: str, language: Optional[str] = None):
+    """Write segments as compact JSON"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': SEGMENTS_VERSION,
+            'language': language,
+            'segments': segments,
+        }, f, ensure_ascii=False, separators=(',', ':'))
+
+def write_srt(segments: List[Dict], path: str):
+    """Write segments as SubRip subtitles, prefixing speaker labels"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for number, segment in enumerate(segments, 1):
+            text = f"{segment['speaker']}: {segment['text']}" if segment.get('speaker') else segment['text']
+            f.write(f"{number}\n{format_subtitle_timestamp(segment['start'])} --> "
+                    f"{format_subtitle_timestamp(segment['end'])}\n{text}\n\n")
+
+def write_vtt(segments: List[Dict], path: str):
+    """Write segments as WebVTT subtitles, with speakers as voice spans"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("WEBVTT\n\n")
+        for segment in segments:
+            text = f"<v {segment['speaker']}>{segment['text']}" if segment.get('speaker') else segment['text']
+            f.write(f"{format_subtitle_timestamp(segment['start'], '.')} --> "
+                    f"{format_subtitle_timestamp(segment['end'], '.')}\n{text}\n\n")
+
+def export_segments(segments: List[Dict], output_dir: str, language: Optional[str] = None) -> Dict[str, str]:
+    """
+    Save segments next to the transcript as transcript_segments.json plus SRT/VTT subtitles
+
+    Returns the written files keyed for organized_files ('segments',
+    'subtitles_srt', 'subtitles_vtt'); empty if there was nothing to write.
+    """
+    spoken = [segment for segment in segments if segment['text'].strip()]
+    compact = [compact_segment(segment, index) for index, segment in enumerate(spoken)]
+    if not compact:
+        return {}
+
+    files = {'segments': os.path.join(output_dir, "transcript_segments.json")}
+    try:
+        write_segments_json(compact, files['segments'], language)
+        if config.whisper.export_subtitles:
+            files['subtitles_srt'] = os.path.join(output_dir, "transcript.srt")
+            files['subtitles_vtt'] = os.path.join(output_dir, "transcript.vtt")
+            write_srt(compact, files['subtitles_srt'])
+            write_vtt(compact, files['subtitles_vtt'])
+        logger.info(f"Saved {len(compact)} timed segments: {', '.join(map(os.path.basename, files.values()))}")
+        return files
+
+    except Exception as e:
+        logger.error(f"Error saving segments: {e}")
+        return {}
+
+def load_segments(path: str) -> List[Dict]:
+    """
+    Timed segments of a session without re-running Whisper
+
+    path is a session directory (resolved through session_info.json) or a
+    transcript_segments.json file. Returns an empty list if there are none.
+    """
+    if os.path.isdir(path):
+        segments_file = os.path.join(path, "transcript_segments.json")
+        info_file = os.path.join(path, "session_info.json")
+        if os.path.exists(info_file):
+            with open(info_file, 'r', encoding='utf-8') as f:
+                name = json.load(f).get('files', {}).get('segments')
+            if name:
+                segments_file = os.path.join(path, name)
+        path = segments_file
+
+    if not os.path.exists(path):
+        logger.warning(f"No timed segments found: {path}")
+        return []
+
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('segments', [])
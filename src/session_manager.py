@@ -5,10 +5,12 @@ Session management for organizing recordings
 import os
 import shutil
 import json
+import subprocess
 from datetime import datetime
 from typing import Optional, Dict, Any
 from src.config import config
 from src.utils import setup_logging, RecordingType, create_session_name, list_directory_files
+from src.audio_io import codec_from_path
 
 logger = setup_logging(level=config.log_level)
 
@@ -28,7 +30,9 @@ class SessionManager:
         return session_path
 
     def organize_files(self, session_path: str, audio_file: Optional[str], video_file: Optional[str],
-                      transcript_file: Optional[str], summary_file: Optional[str]) -> Dict[str, Optional[str]]:
+                      transcript_file: Optional[str], summary_file: Optional[str],
+                      stem_files: Optional[Dict[str, str]] = None,
+                      proxy_file: Optional[str] = None) -> Dict[str, Optional[str]]:
         """Move and organize files into session directory"""
         organized_files = {
             'audio': None,
@@ -38,10 +42,11 @@ class SessionManager:
         }
 
         if audio_file and os.path.exists(audio_file):
-            new_audio_path = os.path.join(session_path, "audio.wav")
+            audio_ext = os.path.splitext(audio_file)[1]
+            new_audio_path = os.path.join(session_path, f"audio{audio_ext}")
             shutil.move(audio_file, new_audio_path)
             organized_files['audio'] = new_audio_path
-            logger.info(f"Moved audio: {audio_file} -> {new_audio_path}")
+            logger.info(f"Moved audio ({codec_from_path(audio_file)}): {audio_file} -> {new_audio_path}")
 
         if video_file and os.path.exists(video_file):
             video_ext = os.path.splitext(video_file)[1]
@@ -50,6 +55,13 @@ class SessionManager:
             organized_files['video'] = new_video_path
             logger.info(f"Moved video: {video_file} -> {new_video_path}")
 
+        if proxy_file and os.path.exists(proxy_file):
+            proxy_ext = os.path.splitext(proxy_file)[1]
+            new_proxy_path = os.path.join(session_path, f"video_proxy{proxy_ext}")
+            shutil.move(proxy_file, new_proxy_path)
+            organized_files['video_proxy'] = new_proxy_path
+            logger.info(f"Moved proxy video: {proxy_file} -> {new_proxy_path}")
+
         if transcript_file and os.path.exists(transcript_file):
             new_transcript_path = os.path.join(session_path, "transcript.txt")
             shutil.move(transcript_file, new_transcript_path)
@@ -62,10 +74,57 @@ class SessionManager:
             organized_files['summary'] = new_summary_path
             logger.info(f"Moved summary: {summary_file} -> {new_summary_path}")
 
+        for source, stem_file in (stem_files or {}).items():
+            if stem_file and os.path.exists(stem_file):
+                stem_ext = os.path.splitext(stem_file)[1]
+                new_stem_path = os.path.join(session_path, f"{source}{stem_ext}")
+                shutil.move(stem_file, new_stem_path)
+                organized_files[f"{source}_audio"] = new_stem_path
+                logger.info(f"Moved {source} stem: {stem_file} -> {new_stem_path}")
+
         return organized_files
 
+    def mux_audio_video(self, session_path: str, audio_file: str, video_file: str,
+                        audio_offset: float = 0.0) -> Optional[str]:
+        """
+        Combine session audio and video into a single synchronized MP4
+
+        audio_offset is how many seconds after the first video frame the first
+        audio frame was captured (negative if audio started first). Streams are
+        copied when MP4 can hold them, so only WAV audio is encoded (to AAC).
+        If the ffmpeg build rejects FLAC/Opus in MP4 the audio alone is
+        encoded to AAC; the video is only re-encoded if copying it fails.
+        """
+        muxed_path = os.path.join(session_path, "recording.mp4")
+        aac = ['-c:a', 'aac', '-b:a', '192k']
+        # -itsoffset can only delay an input, so delay whichever stream started later
+        audio_input = ['-i', audio_file] if audio_offset <= 0 else ['-itsoffset', f"{audio_offset:.6f}", '-i', audio_file]
+        video_input = ['-i', video_file] if audio_offset >= 0 else ['-itsoffset', f"{-audio_offset:.6f}", '-i', video_file]
+
+        attempts = [['-c:v', 'copy'] + aac]
+        if codec_from_path(audio_file) in ('flac', 'opus'):
+            attempts.insert(0, ['-c:v', 'copy', '-c:a', 'copy'])
+        attempts.append(['-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p'] + aac)
+        for codecs in attempts:
+            command = (['ffmpeg', '-y', '-loglevel', 'error'] + video_input + audio_input +
+                       ['-map', '0:v:0', '-map', '1:a:0'] + codecs + ['-movflags', '+faststart', muxed_path])
+            try:
+                subprocess.run(command, check=True, capture_output=True)
+                logger.info(f"Muxed audio and video (audio offset {audio_offset * 1000:+.0f} ms, "
+                            f"video {codecs[1]}, audio {codecs[3]}): {muxed_path}")
+                return muxed_path
+            except (OSError, subprocess.CalledProcessError) as e:
+                error = e.stderr.decode(errors='replace').strip() if getattr(e, 'stderr', None) else e
+                logger.warning(f"Muxing with video {codecs[1]}, audio {codecs[3]} failed: {error}")
+
+        if os.path.exists(muxed_path):
+            os.remove(muxed_path)
+        logger.error("Could not mux audio and video")
+        return None
+
     def create_session_info(self, session_path: str, recording_type: RecordingType,
-                          custom_name: Optional[str], organized_files: Dict[str, Optional[str]]):
+                          custom_name: Optional[str], organized_files: Dict[str, Optional[str]],
+                          metadata: Optional[Dict[str, Any]] = None):
         """Create session info file with metadata"""
         session_name = os.path.basename(session_path)
 
@@ -75,14 +134,20 @@ class SessionManager:
             'custom_name': custom_name,
             'created_at': datetime.now().isoformat(),
             'files': {
-                'audio': os.path.basename(organized_files['audio']) if organized_files['audio'] else None,
-                'video': os.path.basename(organized_files['video']) if organized_files['video'] else None,
-                'transcript': os.path.basename(organized_files['transcript']) if organized_files['transcript'] else None,
-                'summary': os.path.basename(organized_files['summary']) if organized_files['summary'] else None,
+                file_type: os.path.basename(file_path) if file_path else None
+                for file_type, file_path in organized_files.items()
+            },
+            'audio_codecs': {
+                file_type: codec_from_path(file_path)
+                for file_type, file_path in organized_files.items()
+                if file_path and (file_type == 'audio' or file_type.endswith('_audio'))
             },
             'file_sizes_mb': {}
         }
 
+        if metadata:
+            session_info.update(metadata)
+
         for file_type, file_path in organized_files.items():
             if file_path and os.path.exists(file_path):
                 size_bytes = os.path.getsize(file_path)
@@ -0,0 +1,171 @@
+"""
+Slide extraction from screen recordings
+"""
+
+import json
+import os
+import subprocess
+import numpy as np
+from typing import Dict, List, Optional
+from src.config import config
+from src.utils import setup_logging
+
+logger = setup_logging(level=config.log_level)
+
+def _frame_changes(frames: np.ndarray, previous: Optional[np.ndarray]) -> np.ndarray:
+    """
+    Flag scene changes in a batch of grayscale thumbnails, vectorized over the batch
+
+    A frame counts as changed when its 32-bin histogram moved by more than
+    hist_threshold (total variation) or when more than pixel_threshold of its
+    pixels changed noticeably against the previous frame.
+    """
+    count, height, width = frames.shape
+    stack = frames if previous is None else np.concatenate([previous[None], frames])
+
+    bins = (stack >> 3).astype(np.int64) + 32 * np.arange(len(stack))[:, None, None]
+    histograms = np.bincount(bins.ravel(), minlength=32 * len(stack)).reshape(len(stack), 32) / (height * width)
+    hist_change = 0.5 * np.abs(np.diff(histograms, axis=0)).sum(axis=1)
+
+    pixel_change = (np.abs(np.diff(stack.astype(np.int16), axis=0)) > config.slides.pixel_delta).mean(axis=(1, 2))
+
+    changed = (hist_change > config.slides.hist_threshold) | (pixel_change > config.slides.pixel_threshold)
+    if previous is None:
+        changed = np.concatenate([[True], changed])
+    return changed[-count:]
+
+def _read_thumbnails(video_file: str, batch_frames: int = 256):
+    """Yield batches of small grayscale frames sampled at config.slides.sample_fps"""
+    width, height = config.slides.analysis_width, config.slides.analysis_height
+    process = subprocess.Popen(
+        ['ffmpeg', '-loglevel', 'error', '-i', video_file, '-an',
+         '-vf', f"fps={config.slides.sample_fps},scale={width}:{height}:flags=area,format=gray",
+         '-f', 'rawvideo', 'pipe:1'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    frame_bytes = width * height
+    try:
+        while True:
+            data = process.stdout.read(frame_bytes * batch_frames)
+            count = len(data) // frame_bytes
+            if count:
+                yield np.frombuffer(data[:count * frame_bytes], dtype=np.uint8).reshape(count, height, width)
+            if len(data) < frame_bytes * batch_frames:
+                break
+    finally:
+        process.stdout.close()
+        errors = process.stderr.read().decode(errors='replace').strip()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg could not decode {video_file}: {errors}")
+
+def detect_slides(video_file: str) -> List[Dict]:
+    """
+    Find the distinct, stable screens of a recording
+
+    Returns slides with start/end times and the frame_time of their most
+    complete (last stable) frame. Screens shown for less than
+    min_slide_seconds are ignored, and a slide that reappears after a brief
+    interruption is merged with the previous one.
+    """
+    period = 1.0 / config.slides.sample_fps
+    min_frames = max(1, int(round(config.slides.min_slide_seconds * config.slides.sample_fps)))
+
+    runs = []
+    run_start = 0
+    position = 0
+    previous = None
+    for frames in _read_thumbnails(video_file):
+        changed = _frame_changes(frames, previous)
+        for offset in np.flatnonzero(changed):
+            index = position + int(offset)
+            if index > run_start:
+                runs.append((run_start, index - 1, (frames[offset - 1] if offset else previous).copy()))
+            run_start = index
+        position += len(frames)
+        previous = frames[-1].copy()
+    if previous is not None and position > run_start:
+        runs.append((run_start, position - 1, previous))
+
+    slides = []
+    for first, last, thumbnail in runs:
+        if last - first + 1 < min_frames:
+            continue
+        if slides and not _frame_changes(thumbnail[None], slides[-1]['_thumbnail'])[0]:
+            slides[-1].update(end=round((last + 1) * period, 3), frame_time=round(last * period, 3),
+                              _thumbnail=thumbnail)
+            continue
+        slides.append({
+            'start': round(first * period, 3),
+            'end': round((last + 1) * period, 3),
+            'frame_time': round(last * period, 3),
+            '_thumbnail': thumbnail,
+        })
+
+    for slide in slides:
+        slide.pop('_thumbnail')
+    return slides
+
+def link_transcript_segments(slides: List[Dict], segments: List[Dict], offset: float = 0.0) -> List[Dict]:
+    """
+    Attach to each slide the transcript segments spoken while it was visible
+
+    offset is how many seconds after the first video frame the audio starts
+    (av_sync audio_offset_seconds); segment times keep the audio timeline.
+    """
+    for slide in slides:
+        slide['transcript'] = [
+            {key: segment[key] for key in ('start', 'end', 'speaker', 'text') if key in segment}
+            for segment in segments
+            if segment['start'] + offset < slide['end'] and segment['end'] + offset > slide['start']
+        ]
+    return slides
+
+def extract_slides(video_file: str, output_dir: str, segments: Optional[List[Dict]] = None,
+                   offset: float = 0.0) -> Optional[str]:
+    """
+    Save one PNG per slide under output_dir/slides plus a slides.json index
+
+    Segments are linked with the audio start offset relative to the video.
+
+    Returns the path of slides.json, or None if nothing could be extracted.
+    """
+    if not video_file or not os.path.exists(video_file):
+        logger.error(f"Video file not found: {video_file}")
+        return None
+
+    try:
+        logger.info(f"Extracting slides from {video_file}...")
+        slides = detect_slides(video_file)
+        if not slides:
+            logger.info("No stable slides found")
+            return None
+
+        slides_dir = os.path.join(output_dir, "slides")
+        os.makedirs(slides_dir, exist_ok=True)
+        for number, slide in enumerate(slides, 1):
+            image = os.path.join(slides_dir, f"slide_{number:03d}.png")
+            subprocess.run(
+                ['ffmpeg', '-y', '-loglevel', 'error', '-ss', str(slide['frame_time']), '-i', video_file,
+                 '-frames:v', '1', image],
+                check=True, capture_output=True
+            )
+            slide['index'] = number
+            slide['image'] = os.path.relpath(image, output_dir).replace(os.sep, '/')
+
+        if segments:
+            link_transcript_segments(slides, segments, offset)
+
+        index_file = os.path.join(output_dir, "slides.json")
+        with open(index_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'video': os.path.basename(video_file),
+                'sample_fps': config.slides.sample_fps,
+                'slides': slides,
+            }, f, indent=2, ensure_ascii=False)
+
+        logger.info(f"✅ Extracted {len(slides)} slides: {index_file}")
+        return index_file
+
+    except Exception as e:
+        logger.error(f"Slide extraction error: {e}")
+        return None
@@ -0,0 +1,194 @@
+"""
+Parallel transcoding of long recordings
+"""
+
+import cv2
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional
+from src.config import config
+from src.utils import setup_logging
+from src.video_processing import concat_video_segments
+
+logger = setup_logging(level=config.log_level)
+
+@dataclass
+class TranscodeStats:
+    """Throughput report of one transcode run"""
+    segments: int = 0
+    workers: int = 0
+    frames: int = 0
+    media_seconds: float = 0.0
+    split_seconds: float = 0.0
+    encode_seconds: float = 0.0
+    concat_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    input_mb: float = 0.0
+    output_mb: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable report with derived speed figures"""
+        stats = {key: round(value, 2) if isinstance(value, float) else value for key, value in asdict(self).items()}
+        stats['speed'] = round(self.media_seconds / self.wall_seconds, 2) if self.wall_seconds else 0.0
+        stats['fps'] = round(self.frames / self.wall_seconds, 1) if self.wall_seconds else 0.0
+        stats['size_ratio'] = round(self.output_mb / self.input_mb, 3) if self.input_mb else 0.0
+        return stats
+
+def probe_duration(video_file: str) -> float:
+    """Duration of a video in seconds from its container header (0.0 if unknown)"""
+    capture = cv2.VideoCapture(video_file)
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS)
+        frames = capture.get(cv2.CAP_PROP_FRAME_COUNT)
+        return frames / fps if fps > 0 and frames > 0 else 0.0
+    finally:
+        capture.release()
+
+def split_keyframe_segments(video_file: str, output_dir: str, segment_seconds: float) -> List[str]:
+    """
+    Cut the video stream into parts of about segment_seconds without re-encoding
+
+    With stream copy the segment muxer can only cut on keyframes, so every
+    part starts with one and decodes independently.
+    """
+    pattern = os.path.join(output_dir, "part%05d.mkv")
+    subprocess.run(
+        ['ffmpeg', '-y', '-loglevel', 'error', '-i', video_file, '-map', '0:v:0', '-c', 'copy',
+         '-f', 'segment', '-segment_time', str(segment_seconds), '-reset_timestamps', '1', pattern],
+        check=True, capture_output=True, text=True
+    )
+    return sorted(os.path.join(output_dir, name) for name in os.listdir(output_dir) if name.startswith("part"))
+
+def _encode_part_ffmpeg(source: str, target: str, threads: int) -> Dict[str, float]:
+    """Process pool worker: encode one part to H.264 with ffmpeg"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        ['ffmpeg', '-y', '-loglevel', 'error', '-nostats', '-progress', 'pipe:1', '-i', source,
+         '-c:v', 'libx264', '-preset', config.video.transcode_preset, '-crf', str(config.video.crf),
+         '-pix_fmt', 'yuv420p', '-threads', str(threads), '-an', target],
+        check=True, capture_output=True, text=True
+    )
+    progress = dict(line.split('=', 1) for line in result.stdout.splitlines() if '=' in line)
+    return {
+        'frames': int(progress.get('frame', 0)),
+        'media_seconds': int(progress.get('out_time_us', 0) or 0) / 1e6,
+        'encode_seconds': time.perf_counter() - started,
+    }
+
+def _encode_part_opencv(source: str, target: str, threads: int) -> Dict[str, float]:
+    """Process pool worker: re-encode one part frame by frame with OpenCV (MPEG-4)"""
+    started = time.perf_counter()
+    cv2.setNumThreads(threads)
+    capture = cv2.VideoCapture(source)
+    fps = capture.get(cv2.CAP_PROP_FPS) or config.video.fps
+    size = (int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    writer = cv2.VideoWriter(target, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    frames = 0
+    frame = None
+    try:
+        while True:
+            ok, frame = capture.read(frame)
+            if not ok:
+                break
+            writer.write(frame)
+            frames += 1
+    finally:
+        capture.release()
+        writer.release()
+    return {'frames': frames, 'media_seconds': frames / fps, 'encode_seconds': time.perf_counter() - started}
+
+PART_ENCODERS = {
+    'ffmpeg': _encode_part_ffmpeg,
+    'opencv': _encode_part_opencv,
+}
+
+def _print_progress(done: int, total: int, media_seconds: float, elapsed: float):
+    """Single-line progress display"""
+    speed = media_seconds / elapsed if elapsed else 0.0
+    sys.stdout.write(f"\r🔄 Transcoding: {done}/{total} segments ({done * 100 // total}%) - {speed:.1f}x real time")
+    sys.stdout.flush()
+    if done == total:
+        sys.stdout.write("\n")
+
+def transcode_video(video_file: str, output_file: Optional[str] = None, workers: Optional[int] = None,
+                    encoder: str = "ffmpeg", segment_seconds: Optional[float] = None,
+                    progress: bool = True) -> Optional[TranscodeStats]:
+    """
+    Transcode a recording to MP4 using every core
+
+    The video is split on keyframes by stream copy, the parts are encoded in
+    a process pool (each encoder limited to its share of the cores so the
+    pool scales with the worker count) and the results are concatenated
+    without re-encoding. Audio, if any, is taken from the input as AAC.
+    """
+    if not os.path.exists(video_file):
+        logger.error(f"Video file not found: {video_file}")
+        return None
+    if encoder not in PART_ENCODERS:
+        logger.error(f"Unknown transcode encoder: {encoder}")
+        return None
+
+    if not output_file:
+        base, ext = os.path.splitext(video_file)
+        output_file = f"{base}.mp4" if ext.lower() != ".mp4" else f"{base}_transcoded.mp4"
+
+    cores = os.cpu_count() or 1
+    workers = max(1, workers or cores)
+    threads = max(1, cores // workers)
+    duration = probe_duration(video_file)
+    segment_seconds = segment_seconds or config.video.transcode_segment_seconds
+    if duration:
+        # Keep at least two parts per worker so a slow part doesn't leave cores idle at the end
+        segment_seconds = max(config.video.keyframe_seconds, min(segment_seconds, duration / (workers * 2)))
+
+    stats = TranscodeStats(workers=workers, input_mb=os.path.getsize(video_file) / (1024 * 1024))
+    started = time.perf_counter()
+    work_dir = tempfile.mkdtemp(prefix="transcode_", dir=config.paths.temp_dir)
+
+    try:
+        parts = split_keyframe_segments(video_file, work_dir, segment_seconds)
+        stats.segments = len(parts)
+        stats.split_seconds = time.perf_counter() - started
+        logger.info(f"Split {video_file} into {len(parts)} segments; encoding with {workers} workers ({encoder})")
+
+        encoded = [os.path.join(work_dir, f"encoded{index:05d}.mp4") for index in range(len(parts))]
+        encode_started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(PART_ENCODERS[encoder], part, target, threads)
+                       for part, target in zip(parts, encoded)]
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                stats.frames += result['frames']
+                stats.media_seconds += result['media_seconds']
+                if progress:
+                    _print_progress(done, len(parts), stats.media_seconds, time.perf_counter() - started)
+        stats.encode_seconds = time.perf_counter() - encode_started
+
+        concat_started = time.perf_counter()
+        joined = os.path.join(work_dir, "joined.mp4")
+        if not concat_video_segments(encoded, joined):
+            return None
+        subprocess.run(
+            ['ffmpeg', '-y', '-loglevel', 'error', '-i', joined, '-i', video_file,
+             '-map', '0:v:0', '-map', '1:a?', '-c:v', 'copy', '-c:a', 'aac', '-movflags', '+faststart', output_file],
+            check=True, capture_output=True, text=True
+        )
+        stats.concat_seconds = time.perf_counter() - concat_started
+
+        stats.wall_seconds = time.perf_counter() - started
+        stats.output_mb = os.path.getsize(output_file) / (1024 * 1024)
+        logger.info(f"✅ Transcoded {video_file} -> {output_file}: {stats.to_dict()}")
+        return stats
+
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.error(f"Transcoding error: {getattr(e, 'stderr', None) or e}")
+        return None
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,165 @@
+"""
+On-disk cache of Whisper results keyed by audio content and decoding options
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+import numpy as np
+import whisper
+from contextlib import closing
+from typing import Any, Dict, Optional
+from src.config import config
+from src.utils import setup_logging
+
+logger = setup_logging(level=config.log_level)
+
+HASH_BLOCK_BYTES = 1024 * 1024
+
+def hash_file(path: str) -> str:
+    """BLAKE2b of a file's content, read in fixed blocks into one reused buffer"""
+    digest = hashlib.blake2b(digest_size=20)
+    buffer = bytearray(HASH_BLOCK_BYTES)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            digest.update(view[:count])
+    return digest.hexdigest()
+
+def hash_samples(audio) -> str:
+    """BLAKE2b of in-memory 16 kHz float32 samples"""
+    return hashlib.blake2b(np.ascontiguousarray(audio, dtype=np.float32).data, digest_size=20).hexdigest()
+
+def inputs_key(inputs: Dict[str, Any]) -> str:
+    """Cache key for a set of key inputs (see TranscriptCache.key_inputs)"""
+    return hashlib.blake2b(json.dumps(inputs, sort_keys=True).encode(), digest_size=20).hexdigest()
+
+class TranscriptCache:
+    """
+    Size-bounded LRU of Whisper results in a SQLite database
+
+    Entries are keyed by the hash of the audio plus every option that
+    changes the result (model size, language, task, word timestamps, VAD,
+    chunking, initial prompt and Whisper version), so changing any of them
+    misses the cache. File hashes are remembered by path, size and
+    modification time, so a repeated run over an unchanged file is a couple
+    of index lookups. Results are stored as zlib-compressed JSON; the least
+    recently used ones are deleted once the total exceeds max_mb.
+    """
+    def __init__(self, path: Optional[str] = None, max_mb: Optional[float] = None):
+        self.path = path or os.path.join(config.paths.cache_dir, "transcripts.sqlite")
+        self.max_bytes = int((max_mb or config.whisper.cache_max_mb) * 1024 * 1024)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS transcripts ("
+                "key TEXT PRIMARY KEY, audio_hash TEXT, model TEXT, language TEXT, task TEXT, "
+                "whisper_version TEXT, result BLOB, size INTEGER, created REAL, last_used REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS transcripts_last_used ON transcripts (last_used)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS file_hashes ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, hash TEXT)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def audio_hash(self, audio_file: Optional[str] = None, audio=None) -> str:
+        """Content hash of a file (memoized by size and mtime) or of in-memory samples"""
+        if audio is not None:
+            return hash_samples(audio)
+
+        path = os.path.abspath(audio_file)
+        stat = os.stat(path)
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT size, mtime_ns, hash FROM file_hashes WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        digest = hash_file(path)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?)",
+                         (path, stat.st_size, stat.st_mtime_ns, digest))
+        return digest
+
+    def key_inputs(self, audio_hash: str, model: Optional[str] = None, language: Optional[str] = None,
+                   task: Optional[str] = None, initial_prompt: Optional[str] = None) -> Dict[str, Any]:
+        """Everything the result for an audio hash depends on, with unset options taken from the config"""
+        return {
+            'audio_hash': audio_hash,
+            'model': model or config.whisper.model_size,
+            'language': language or config.whisper.language or "auto",
+            'task': task or config.whisper.task,
+            'word_timestamps': config.whisper.word_timestamps,
+            'vad': config.whisper.vad_enabled,
+            'chunking': [config.whisper.parallel_chunks, config.whisper.chunk_seconds,
+                         config.whisper.chunk_overlap_seconds],
+            'initial_prompt': initial_prompt or "",
+            'whisper_version': whisper.__version__,
+        }
+
+    def key(self, audio_hash: str, model: Optional[str] = None, language: Optional[str] = None,
+            task: Optional[str] = None, initial_prompt: Optional[str] = None) -> str:
+        """Cache key for an audio hash under the given (or configured) decoding options"""
+        return inputs_key(self.key_inputs(audio_hash, model, language, task, initial_prompt))
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached result for a key, refreshing its recency, or None"""
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT result FROM transcripts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE transcripts SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key: str, inputs: Dict[str, Any], result: Dict):
+        """Store a result under the key built from inputs and evict least recently used entries beyond the limit"""
+        blob = zlib.compress(json.dumps(result, ensure_ascii=False).encode('utf-8'))
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, inputs['audio_hash'], inputs['model'], inputs['language'], inputs['task'],
+                 inputs['whisper_version'], blob, len(blob), now, now)
+            )
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Delete least recently used entries until the total size fits"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM transcripts ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM transcripts WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        logger.info(f"Evicted {evicted} cached transcripts to stay within {self.max_bytes / (1024 * 1024):.0f} MB")
+
+    def clear(self):
+        """Delete every cached result and file hash"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM transcripts")
+            conn.execute("DELETE FROM file_hashes")
+        with closing(self._connect()) as conn:
+            conn.execute("VACUUM")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Number and total size of cached results"""
+        with closing(self._connect()) as conn:
+            count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcripts").fetchone()
+        return {
+            'path': self.path,
+            'entries': count,
+            'size_mb': round(size / (1024 * 1024), 2),
+            'max_mb': round(self.max_bytes / (1024 * 1024), 2),
+        }
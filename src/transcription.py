@@ -3,30 +3,288 @@ Transcription module using Whisper
 """
 
 import whisper
-from typing import Optional
+import numpy as np
+import multiprocessing
+import os
+import shutil
+import string
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from src.config import config
 from src.utils import setup_logging
-import os
+from src.vad import detect_speech_regions
+from src.model_registry import estimated_model_mb, registry
+from src.transcript_cache import TranscriptCache, inputs_key
+from src.audio_io import read_wav_info
 
 logger = setup_logging(level=config.log_level)
 
+SPEAKER_LABELS = {'mic': 'Me', 'system': 'Others'}
+
+def load_worker_audio(path: str):
+    """Open a raw 16 kHz float32 buffer memory-mapped, or pass other audio files through"""
+    if path.endswith('.f32'):
+        return np.memmap(path, dtype=np.float32, mode='c')
+    return path
+
+WHISPER_SAMPLE_RATE = 16000
+
+def audio_duration(path: str) -> Optional[float]:
+    """Duration in seconds from the file header (raw .f32, WAV or ffprobe), or None if unknown"""
+    try:
+        if path.endswith('.f32'):
+            return os.path.getsize(path) / 4 / WHISPER_SAMPLE_RATE
+        if path.lower().endswith('.wav'):
+            info = read_wav_info(path)
+            return info['frames'] / info['sample_rate']
+        if shutil.which('ffprobe'):
+            result = subprocess.run(
+                ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', path],
+                check=True, capture_output=True, text=True
+            )
+            return float(result.stdout.strip())
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        pass
+    return None
+
+def _compact_speech(audio: np.ndarray, regions: List, gap_seconds: float = 0.3):
+    """Concatenate speech regions separated by short silences; returns audio and a time map"""
+    gap = np.zeros(int(gap_seconds * WHISPER_SAMPLE_RATE), dtype=np.float32)
+    pieces = []
+    time_map = []
+    compact_time = 0.0
+    for start, end in regions:
+        piece = audio[int(start * WHISPER_SAMPLE_RATE):int(end * WHISPER_SAMPLE_RATE)]
+        time_map.append((compact_time, start))
+        pieces.extend([piece, gap])
+        compact_time += (len(piece) + len(gap)) / WHISPER_SAMPLE_RATE
+    return np.concatenate(pieces).astype(np.float32), np.array(time_map)
+
+def _restore_timestamps(result: Dict, time_map: np.ndarray) -> Dict:
+    """Map segment (and word) times in compacted audio back to the original timeline"""
+    compact_starts = time_map[:, 0]
+    offsets = time_map[:, 1] - compact_starts
+
+    def restore(t: float) -> float:
+        index = max(int(np.searchsorted(compact_starts, t, side='right')) - 1, 0)
+        return round(float(t + offsets[index]), 3)
+
+    for segment in result.get('segments', []):
+        segment['start'] = restore(segment['start'])
+        segment['end'] = restore(segment['end'])
+        for word in segment.get('words', []) or []:
+            word['start'] = restore(word['start'])
+            word['end'] = restore(word['end'])
+    return result
+
+def transcribe_audio(model, audio, **options) -> Dict:
+    """
+    Run Whisper on a file path or 16 kHz float array, skipping silence when VAD is enabled
+
+    Only detected speech regions are decoded; segment timestamps are mapped
+    back onto the original timeline.
+    """
+    if not config.whisper.vad_enabled:
+        return model.transcribe(audio, **options)
+
+    if isinstance(audio, str):
+        audio = whisper.load_audio(audio)
+
+    regions = detect_speech_regions(audio, WHISPER_SAMPLE_RATE)
+    duration = len(audio) / WHISPER_SAMPLE_RATE
+    speech = sum(end - start for start, end in regions)
+    if not regions:
+        logger.info("VAD found no speech - skipping Whisper")
+        return {'text': '', 'segments': [], 'language': options.get('language')}
+    if speech > 0.9 * duration:
+        return model.transcribe(audio, **options)
+
+    logger.info(f"VAD: decoding {speech:.0f}s of speech out of {duration:.0f}s ({len(regions)} regions)")
+    compact, time_map = _compact_speech(audio, regions)
+    return _restore_timestamps(model.transcribe(compact, **options), time_map)
+
+def _transcribe_stem(path: str, model_size: str, task: str, language: Optional[str], threads: int,
+                     word_timestamps: bool = False) -> List[Dict]:
+    """Process pool worker: transcribe one stem and return its timed segments"""
+    import torch
+    torch.set_num_threads(threads)
+
+    key = registry.key(model_size)
+    result = transcribe_audio(registry.get(*key), load_worker_audio(path), task=task, language=language,
+                              fp16=key[2] == "fp16", word_timestamps=word_timestamps)
+    segments = []
+    for segment in result.get('segments', []):
+        stem_segment = {'start': segment['start'], 'end': segment['end'], 'text': segment['text'].strip()}
+        if segment.get('words'):
+            stem_segment['words'] = segment['words']
+        segments.append(stem_segment)
+    return segments
+
+def plan_chunks(duration: float, regions: List, chunk_seconds: float, overlap_seconds: float) -> List[Tuple[float, float, float, float]]:
+    """
+    Split a recording into chunks for parallel transcription
+
+    Each cut is placed in the middle of the silence between speech regions
+    that lies closest to the nominal chunk boundary (or at the boundary
+    itself when there is none within a quarter chunk). Returns
+    (start, end, keep_from, keep_to) per chunk: the chunk audio is
+    [start, end), the cut extended by overlap_seconds on both sides, and
+    [keep_from, keep_to) is the part between its cuts.
+    """
+    gaps = [(previous_end + next_start) / 2 for (_, previous_end), (next_start, _) in zip(regions, regions[1:])]
+    cuts = [0.0]
+    while duration - cuts[-1] > chunk_seconds * 1.5:
+        target = cuts[-1] + chunk_seconds
+        candidates = [gap for gap in gaps if abs(gap - target) <= chunk_seconds / 4]
+        cuts.append(min(candidates, key=lambda gap: abs(gap - target)) if candidates else target)
+    cuts.append(duration)
+
+    return [
+        (max(0.0, keep_from - overlap_seconds), min(duration, keep_to + overlap_seconds), keep_from, keep_to)
+        for keep_from, keep_to in zip(cuts, cuts[1:])
+    ]
+
+WORD_PUNCTUATION = string.punctuation + '\u2014\u2013\u2026\u201c\u201d\u2018\u2019\u00ab\u00bb\u00bf\u00a1'
+
+def _normalize_word(word: str) -> str:
+    """Lower-case word without surrounding punctuation ('' for pure punctuation)"""
+    return word.strip(WORD_PUNCTUATION).lower()
+
+def _words(text: str) -> List[str]:
+    """Lower-case words without punctuation, for overlap comparison"""
+    return [word for word in map(_normalize_word, text.split()) if word]
+
+def _drop_words(items: List, count: int, text_of: Callable[[Any], str]) -> List:
+    """Remove the first count real words (as counted by _words) and any punctuation before them"""
+    seen = 0
+    for index, item in enumerate(items):
+        if seen == count:
+            return items[index:]
+        if _normalize_word(text_of(item)):
+            seen += 1
+    return []
+
+def stitch_chunks(chunks: List[Tuple[float, float, List[Dict]]], max_overlap_words: int = 12) -> List[Dict]:
+    """
+    Join per-chunk segments (already on the original timeline) into one list
+
+    chunks holds (keep_from, keep_to, segments) in order. A chunk contributes
+    the segments that start before its cut and end after everything already
+    stitched, so a sentence running across a cut is taken from both sides;
+    the longest run of words ending the previous chunk that also starts the
+    next one is then removed.
+    """
+    stitched = []
+    for keep_from, keep_to, segments in chunks:
+        covered = stitched[-1]['end'] if stitched else keep_from
+        kept = [dict(segment) for segment in segments
+                if segment['start'] < keep_to and segment['end'] > covered and segment['text'].strip()]
+        if stitched and kept:
+            tail = _words(' '.join(segment['text'] for segment in stitched[-3:]))[-max_overlap_words:]
+            head = _words(kept[0]['text'])[:max_overlap_words]
+            repeated = next((n for n in range(min(len(tail), len(head)), 0, -1) if tail[-n:] == head[:n]), 0)
+            if repeated:
+                kept[0]['text'] = ' ' + ' '.join(_drop_words(kept[0]['text'].split(), repeated, str))
+                if kept[0].get('words'):
+                    kept[0]['words'] = _drop_words(kept[0]['words'], repeated, lambda word: word['word'])
+                    if kept[0]['words']:
+                        kept[0]['start'] = kept[0]['words'][0]['start']
+                if not kept[0]['text'].strip():
+                    kept.pop(0)
+        stitched.extend(kept)
+    return stitched
+
+def _init_chunk_worker(model_size: str, threads: int):
+    """Process pool initializer: every worker loads its own model once"""
+    import torch
+    torch.set_num_threads(threads)
+    registry.get(model_size)
+
+def _transcribe_chunk(path: str, start: float, end: float, model_size: str, task: str,
+                      language: Optional[str], word_timestamps: bool = False) -> Dict:
+    """Process pool worker: transcribe [start, end) of a 16 kHz .f32 buffer, timestamps on the full timeline"""
+    audio = load_worker_audio(path)
+    chunk = np.array(audio[int(start * WHISPER_SAMPLE_RATE):int(end * WHISPER_SAMPLE_RATE)], dtype=np.float32)
+    key = registry.key(model_size)
+    result = transcribe_audio(registry.get(*key), chunk, task=task, language=language, fp16=key[2] == "fp16",
+                              word_timestamps=word_timestamps)
+    for segment in result.get('segments', []):
+        segment['start'] = round(segment['start'] + start, 3)
+        segment['end'] = round(segment['end'] + start, 3)
+        for word in segment.get('words', []) or []:
+            word['start'] = round(word['start'] + start, 3)
+            word['end'] = round(word['end'] + start, 3)
+    return {'segments': result.get('segments', []), 'language': result.get('language')}
+
+def format_timestamp(seconds: float) -> str:
+    """Format seconds as HH:MM:SS"""
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def merge_attributed_segments(segments_by_speaker: Dict[str, List[Dict]]) -> List[Dict]:
+    """Interleave per-speaker segments by start time, joining consecutive turns of one speaker"""
+    labelled = [
+        dict(segment, speaker=speaker)
+        for speaker, segments in segments_by_speaker.items()
+        for segment in segments if segment['text']
+    ]
+    labelled.sort(key=lambda segment: (segment['start'], segment['end']))
+
+    turns = []
+    for segment in labelled:
+        if turns and turns[-1]['speaker'] == segment['speaker']:
+            turns[-1]['end'] = max(turns[-1]['end'], segment['end'])
+            turns[-1]['text'] += ' ' + segment['text']
+            if segment.get('words'):
+                turns[-1]['words'] = turns[-1].get('words', []) + segment['words']
+        else:
+            turns.append(dict(segment))
+    return turns
+
 class Transcriber:
-    """Whisper transcription handler"""
+    """
+    Whisper transcription handler
+
+    The model comes from the process-wide registry and is only loaded when
+    first needed; call warm_up() to load it in the background beforehand.
+    """
     def __init__(self):
-        self.model = whisper.load_model(config.whisper.model_size)
+        self.last_segments: List[Dict] = []
+        self.last_language: Optional[str] = None
+        self.cache = TranscriptCache() if config.whisper.cache_enabled else None
 
-    def transcribe(self, audio_file: str) -> Optional[str]:
-        """Transcribe audio to text using Whisper"""
-        logger.info(f"Transcribing audio file: {audio_file}")
-        if not os.path.exists(audio_file):
-            logger.error(f"Audio file not found: {audio_file}")
+    @property
+    def model(self):
+        """The configured Whisper model, loaded on first access"""
+        return registry.get()
+
+    def warm_up(self):
+        """Start loading the configured model on a background thread"""
+        return registry.warm_up()
+
+    def transcribe(self, audio_file: str, audio: Optional[np.ndarray] = None) -> Optional[str]:
+        """
+        Transcribe audio to text using Whisper
+
+        If audio is given it must be 16 kHz mono float32 samples of audio_file
+        (as produced by AudioRecorder); Whisper then decodes it directly and
+        skips spawning ffmpeg to read the file again. Results are cached by
+        audio content and options, so transcribing the same audio again
+        returns immediately.
+        """
+        self.last_segments = []
+        self.last_language = None
+        result = self.cached_result(audio_file, audio)
+        if result is None:
             return None
+        self.last_segments = result.get('segments', [])
+        self.last_language = result.get('language')
 
         try:
-            result = self.model.transcribe(audio_file, task=config.whisper.task, language=config.whisper.language)
             transcript = result.get('text', '')
 
-            transcript_file = audio_file.replace(".wav", "_transcript.txt")
+            transcript_file = os.path.splitext(audio_file)[0] + "_transcript.txt"
             with open(transcript_file, "w", encoding="utf-8") as f:
                 f.write(transcript)
 
@@ -37,6 +295,183 @@ class Transcriber:
             logger.error(f"Transcription error: {e}")
             return None
 
+    def cached_result(self, audio_file: str, audio: Optional[np.ndarray] = None) -> Optional[Dict]:
+        """transcribe_result() through the transcript cache"""
+        if self.cache is None or (audio is None and not os.path.exists(audio_file)):
+            return self.transcribe_result(audio_file, audio)
+
+        try:
+            exists = os.path.exists(audio_file)
+            audio_hash = self.cache.audio_hash(audio_file if exists else None, None if exists else audio)
+            inputs = self.cache.key_inputs(audio_hash)
+            key = inputs_key(inputs)
+            result = self.cache.get(key)
+        except Exception as e:
+            logger.warning(f"Transcript cache unavailable: {e}")
+            return self.transcribe_result(audio_file, audio)
+
+        if result is not None:
+            logger.info(f"Using cached transcript for {audio_file}")
+            return result
+
+        result = self.transcribe_result(audio_file, audio)
+        if result is not None:
+            try:
+                self.cache.put(key, inputs, result)
+            except Exception as e:
+                logger.warning(f"Could not cache transcript: {e}")
+        return result
+
+    def transcribe_result(self, audio_file: str, audio: Optional[np.ndarray] = None) -> Optional[Dict]:
+        """Run Whisper and return its raw result (text and timed segments) without writing files"""
+        logger.info(f"Transcribing audio file: {audio_file}")
+        if audio is None and not os.path.exists(audio_file):
+            logger.error(f"Audio file not found: {audio_file}")
+            return None
+
+        try:
+            source = audio if audio is not None else audio_file
+            if self._parallel_enabled():
+                min_seconds = 2 * config.whisper.chunk_seconds
+                duration = len(audio) / WHISPER_SAMPLE_RATE if audio is not None else audio_duration(audio_file)
+                # Only decode the file up front if it is (or may be) long enough to split
+                if duration is None or duration >= min_seconds:
+                    if audio is None:
+                        source = load_worker_audio(audio_file)
+                        if isinstance(source, str):
+                            source = whisper.load_audio(audio_file)
+                    if len(source) / WHISPER_SAMPLE_RATE >= min_seconds:
+                        return self.transcribe_parallel(source)
+
+            return self.transcribe_window(source)
+
+        except Exception as e:
+            logger.error(f"Transcription error: {e}")
+            return None
+
+    def _parallel_enabled(self) -> bool:
+        """
+        Whether long audio is split across CPU worker processes
+
+        Not on CUDA: every worker would load its own copy of the model onto
+        the same GPU, where a single pass is faster anyway.
+        """
+        if not config.whisper.parallel_chunks or (os.cpu_count() or 1) < 2:
+            return False
+        return not registry.key()[1].startswith("cuda")
+
+    def _worker_limit(self) -> int:
+        """Workers whose models fit in the memory budget left next to the models already loaded here"""
+        budget = config.whisper.model_memory_mb - registry.resident_mb()
+        return max(1, int(budget // estimated_model_mb(config.whisper.model_size)))
+
+    def transcribe_window(self, audio, **options) -> Dict:
+        """Single Whisper pass over a file or 16 kHz array with the cached model; options go to Whisper"""
+        options.setdefault('word_timestamps', config.whisper.word_timestamps)
+        key = registry.key()
+        return transcribe_audio(registry.get(*key), audio, task=config.whisper.task,
+                                language=config.whisper.language, fp16=key[2] == "fp16", **options)
+
+    def transcribe_parallel(self, audio: np.ndarray, workers: Optional[int] = None) -> Dict:
+        """
+        Transcribe long 16 kHz audio in chunks on a process pool
+
+        Chunks are cut at silences with a small overlap (see plan_chunks) and
+        every worker loads its own model once, so throughput grows with the
+        number of workers (capped so their models fit in model_memory_mb);
+        the results are stitched back onto the original timeline.
+        """
+        duration = len(audio) / WHISPER_SAMPLE_RATE
+        regions = detect_speech_regions(audio, WHISPER_SAMPLE_RATE)
+        chunks = plan_chunks(duration, regions, config.whisper.chunk_seconds, config.whisper.chunk_overlap_seconds)
+        cores = os.cpu_count() or 1
+        workers = max(1, min(workers or config.whisper.parallel_workers or cores, len(chunks)))
+        limit = self._worker_limit()
+        if workers > limit:
+            logger.info(f"Limiting to {limit} workers: {config.whisper.model_size} models must fit in "
+                        f"{config.whisper.model_memory_mb} MB")
+            workers = limit
+        threads = max(1, cores // workers)
+        logger.info(f"Transcribing {duration:.0f}s in {len(chunks)} chunks on {workers} workers")
+
+        path = audio.filename if isinstance(audio, np.memmap) and str(audio.filename).endswith('.f32') else None
+        temp_path = None
+        if path is None:
+            temp_path = os.path.join(config.paths.temp_dir, f"whisper_chunks_{os.getpid()}_{id(audio)}.f32")
+            np.asarray(audio, dtype=np.float32).tofile(temp_path)
+            path = temp_path
+
+        try:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_chunk_worker,
+                                     initargs=(config.whisper.model_size, threads)) as pool:
+                futures = [
+                    pool.submit(_transcribe_chunk, path, start, end, config.whisper.model_size,
+                                config.whisper.task, config.whisper.language, config.whisper.word_timestamps)
+                    for start, end, _, _ in chunks
+                ]
+                results = [future.result() for future in futures]
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        segments = stitch_chunks([(keep_from, keep_to, result['segments'])
+                                  for (_, _, keep_from, keep_to), result in zip(chunks, results)])
+        for index, segment in enumerate(segments):
+            segment['id'] = index
+        languages = [result['language'] for result in results if result['language']]
+        return {
+            'text': ''.join(segment['text'] for segment in segments).strip(),
+            'segments': segments,
+            'language': max(set(languages), key=languages.count) if languages else config.whisper.language,
+        }
+
+    def transcribe_stems(self, stems: Dict[str, str], output_file: str) -> Optional[str]:
+        """
+        Transcribe separate system/microphone stems in parallel and attribute speakers
+
+        stems maps 'system'/'mic' to audio files or raw 16 kHz .f32 buffers on a
+        shared timeline. Each stem is decoded in its own worker process and the
+        segments are merged into a "Me / Others" transcript. Stems bypass the
+        transcript cache: each is a fresh recording, so a hit is unlikely and
+        hashing both files would only add work before the workers start.
+        """
+        logger.info(f"Transcribing {len(stems)} stems in parallel: {', '.join(stems)}")
+        self.last_segments = []
+        self.last_language = config.whisper.language
+        missing = [path for path in stems.values() if not os.path.exists(path)]
+        if missing:
+            logger.error(f"Stem files not found: {missing}")
+            return None
+
+        try:
+            threads = max(1, (os.cpu_count() or 1) // len(stems))
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=len(stems), mp_context=context) as pool:
+                futures = {
+                    source: pool.submit(_transcribe_stem, path, config.whisper.model_size,
+                                        config.whisper.task, config.whisper.language, threads,
+                                        config.whisper.word_timestamps)
+                    for source, path in stems.items()
+                }
+                segments_by_speaker = {
+                    SPEAKER_LABELS.get(source, source): future.result()
+                    for source, future in futures.items()
+                }
+
+            turns = merge_attributed_segments(segments_by_speaker)
+            self.last_segments = turns
+            with open(output_file, "w", encoding="utf-8") as f:
+                for turn in turns:
+                    f.write(f"[{format_timestamp(turn['start'])}] {turn['speaker']}: {turn['text']}\n")
+
+            logger.info(f"Attributed transcript saved: {output_file}")
+            return output_file
+
+        except Exception as e:
+            logger.error(f"Stem transcription error: {e}")
+            return None
+
 if __name__ == "__main__":
     transcriber = Transcriber()
     transcript = transcriber.transcribe('sample_audio.wav')
@@ -105,7 +105,7 @@ def find_audio_video_files() -> Tuple[Optional[str], Optional[str]]:
     """Find audio and video files in current directory"""
     import glob
 
-    audio_files = glob.glob("*.wav") + glob.glob("*.mp3")
+    audio_files = glob.glob("*.wav") + glob.glob("*.mp3") + glob.glob("*.flac") + glob.glob("*.opus")
     video_files = glob.glob("*.avi") + glob.glob("*.mp4")
 
     audio_file = audio_files[0] if audio_files else None
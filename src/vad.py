@@ -0,0 +1,69 @@
+"""
+Voice activity detection for mono float audio
+
+Pure NumPy, so transcription can use it without the audio capture stack.
+"""
+
+import numpy as np
+from typing import List, Tuple
+
+# Frames quieter than this are treated as digital silence rather than room noise
+DIGITAL_SILENCE_DB = -90.0
+
+def detect_speech_regions(audio: np.ndarray, sample_rate: int = 16000, frame_ms: int = 30,
+                          start_db: float = 12.0, continue_db: float = 6.0, zcr_threshold: float = 0.25,
+                          padding_ms: int = 200, min_silence_ms: int = 500,
+                          min_speech_ms: int = 250, min_floor_db: float = -70.0) -> List[Tuple[float, float]]:
+    """
+    Find speech regions in mono float audio with an energy/zero-crossing VAD
+
+    Thresholds are relative to the recording's noise floor: the 10th
+    percentile of frame energy over frames that are not digital silence, but
+    never below min_floor_db (dBFS). A region starts on a frame start_db
+    above the floor and continues while frames stay continue_db above it, or
+    while a quieter frame has a high zero-crossing rate (unvoiced
+    consonants). Returns (start, end) pairs in seconds.
+    """
+    frame_length = int(sample_rate * frame_ms / 1000)
+    frame_count = len(audio) // frame_length
+    if frame_count == 0:
+        return []
+
+    frames = np.asarray(audio[:frame_count * frame_length], dtype=np.float32).reshape(frame_count, frame_length)
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame_length
+
+    # Digital silence (zero padding, muted or late-starting sources) would drag a
+    # percentile to the log clamp and let every frame through, so it is excluded
+    audible = energy_db > DIGITAL_SILENCE_DB
+    if not audible.any():
+        return []
+    noise_floor = max(float(np.percentile(energy_db[audible], 10)), min_floor_db)
+    strong = energy_db > noise_floor + start_db
+    active = (energy_db > noise_floor + continue_db) | ((zcr > zcr_threshold) & (energy_db > noise_floor + continue_db / 2))
+    active |= strong
+
+    # Hysteresis: keep runs of active frames that contain at least one strong frame
+    edges = np.diff(np.concatenate([[0], active.astype(np.int8), [0]]))
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)
+    if len(run_starts) == 0:
+        return []
+    has_strong = np.maximum.reduceat(strong, run_starts) & (run_ends > run_starts)
+    run_starts, run_ends = run_starts[has_strong], run_ends[has_strong]
+
+    frame_seconds = frame_length / sample_rate
+    duration = len(audio) / sample_rate
+    padding = padding_ms / 1000
+    starts = np.maximum(run_starts * frame_seconds - padding, 0.0)
+    ends = np.minimum(run_ends * frame_seconds + padding, duration)
+
+    regions = []
+    for start, end in zip(starts, ends):
+        if regions and start - regions[-1][1] < min_silence_ms / 1000:
+            regions[-1][1] = max(regions[-1][1], end)
+        else:
+            regions.append([start, end])
+
+    return [(float(start), float(end)) for start, end in regions if end - start >= min_speech_ms / 1000]
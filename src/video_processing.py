@@ -4,15 +4,339 @@ Video processing for screen recording
 
 import cv2
 import numpy as np
-import pyautogui
+import os
+import shutil
+import subprocess
 import threading
 import time
-from typing import Optional, Tuple
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Tuple
 from src.config import config
 from src.utils import setup_logging, generate_timestamp
+from src.frame_sources import create_frame_source, detect_active_region, get_screen_size
+from src.frame_pipeline import FrameChangeDetector, FramePipeline
 
 logger = setup_logging(level=config.log_level)
 
+def concat_video_segments(segment_files: List[str], output_file: str) -> bool:
+    """Join rolling video segments into one file with ffmpeg stream copy"""
+    segment_files = [path for path in segment_files if os.path.exists(path) and os.path.getsize(path) > 0]
+    if not segment_files:
+        return False
+
+    list_file = f"{output_file}.segments.txt"
+    try:
+        with open(list_file, 'w', encoding='utf-8') as f:
+            for path in segment_files:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+
+        subprocess.run(
+            ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', list_file, '-c', 'copy', output_file],
+            check=True, capture_output=True
+        )
+        for path in segment_files:
+            os.remove(path)
+        logger.info(f"Joined {len(segment_files)} video segments into {output_file}")
+        return True
+
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+        logger.error(f"Could not join video segments, keeping them separately: {e}")
+        return False
+
+    finally:
+        if os.path.exists(list_file):
+            os.remove(list_file)
+
+_fps_mode_supported = None
+
+def ffmpeg_vfr_args() -> List[str]:
+    """Output options for variable frame rate: -fps_mode (ffmpeg >= 5.1) or the older -vsync"""
+    global _fps_mode_supported
+    if _fps_mode_supported is None:
+        try:
+            help_text = subprocess.run(['ffmpeg', '-hide_banner', '-h', 'long'], capture_output=True,
+                                       text=True, errors='replace', timeout=10).stdout
+            _fps_mode_supported = '-fps_mode' in help_text
+        except (OSError, subprocess.SubprocessError):
+            _fps_mode_supported = False
+        if not _fps_mode_supported:
+            logger.info("ffmpeg has no -fps_mode option - using -vsync vfr")
+    return ['-fps_mode', 'vfr'] if _fps_mode_supported else ['-vsync', 'vfr']
+
+def _ebml_size(size: int) -> bytes:
+    """EBML variable-length size field"""
+    length = 1
+    while size >= (1 << (7 * length)) - 1:
+        length += 1
+    return (size | (1 << (7 * length))).to_bytes(length, 'big')
+
+def _ebml(element_id: bytes, payload: bytes) -> bytes:
+    return element_id + _ebml_size(len(payload)) + payload
+
+def _ebml_uint(value: int) -> bytes:
+    return value.to_bytes(max(1, (value.bit_length() + 7) // 8), 'big')
+
+def matroska_raw_header(frame_size: Tuple[int, int], fps: float) -> bytes:
+    """
+    Start of a live Matroska stream with one uncompressed BGR24 video track
+
+    The segment has unknown size so frames can follow as clusters
+    indefinitely; timestamps are in microseconds. The default duration of one
+    frame slot gives the last frame its length.
+    """
+    width, height = frame_size
+    ebml = _ebml(b'\x1a\x45\xdf\xa3', _ebml(b'\x42\x86', _ebml_uint(1)) + _ebml(b'\x42\xf7', _ebml_uint(1))
+                 + _ebml(b'\x42\xf2', _ebml_uint(4)) + _ebml(b'\x42\xf3', _ebml_uint(8))
+                 + _ebml(b'\x42\x82', b'matroska') + _ebml(b'\x42\x87', _ebml_uint(4))
+                 + _ebml(b'\x42\x85', _ebml_uint(2)))
+    info = _ebml(b'\x15\x49\xa9\x66', _ebml(b'\x2a\xd7\xb1', _ebml_uint(1000)))
+    video = (_ebml(b'\xb0', _ebml_uint(width)) + _ebml(b'\xba', _ebml_uint(height))
+             + _ebml(b'\x2e\xb5\x24', b'BGR\x18'))
+    track = _ebml(b'\xae', _ebml(b'\xd7', _ebml_uint(1)) + _ebml(b'\x73\xc5', _ebml_uint(1))
+                  + _ebml(b'\x83', _ebml_uint(1)) + _ebml(b'\x23\xe3\x83', _ebml_uint(int(round(1e9 / fps))))
+                  + _ebml(b'\x86', b'V_UNCOMPRESSED') + _ebml(b'\xe0', video))
+    return ebml + b'\x18\x53\x80\x67\x01\xff\xff\xff\xff\xff\xff\xff' + info + _ebml(b'\x16\x54\xae\x6b', track)
+
+def matroska_frame_prefix(timestamp_us: int, frame_bytes: int) -> bytes:
+    """Cluster and SimpleBlock headers that precede one raw keyframe at the given timestamp"""
+    block_header = b'\x81\x00\x00\x80'
+    simple_block = b'\xa3' + _ebml_size(len(block_header) + frame_bytes) + block_header
+    timestamp = _ebml(b'\xe7', _ebml_uint(timestamp_us))
+    return b'\x1f\x43\xb6\x75' + _ebml_size(len(timestamp) + len(simple_block) + frame_bytes) + timestamp + simple_block
+
+def write_frames(writer, frame: np.ndarray, count: int = 1, repeat: bool = False):
+    """Write a frame covering count slots; FFmpegVideoWriter can skip repeats, cv2.VideoWriter writes each one"""
+    if isinstance(writer, FFmpegVideoWriter):
+        writer.write(frame, count, repeat)
+    else:
+        for _ in range(count):
+            writer.write(frame)
+
+class FFmpegVideoWriter:
+    """
+    cv2.VideoWriter look-alike that pipes raw BGR frames into an ffmpeg H.264 encoder
+
+    Output is fragmented MP4 (a fragment per keyframe, with an empty moov up
+    front) flushed as each fragment completes, so a file cut short by a crash
+    is still playable up to its last keyframe interval.
+
+    With VFR enabled the frames travel in a Matroska stream that carries a
+    timestamp per frame, so a repeated frame is not sent again: it only
+    stretches the previous frame's display time. A repeat is re-sent once per
+    keyframe interval so fragments keep being flushed, and once at the end so
+    the video lasts until its final slot.
+    """
+    def __init__(self, filename: str, fps: float, frame_size: Tuple[int, int], crf: Optional[int] = None):
+        self.filename = filename
+        self.frame_size = frame_size
+        self.fps = fps
+        self.vfr = config.video.vfr
+        width, height = frame_size
+        self._frame_bytes = width * height * 3
+        self._failed = False
+        self._slot = 0
+        self._sent_slot = None
+        self._last_frame = None
+        self._keyframe_slots = max(1, int(fps * config.video.keyframe_seconds))
+
+        if self.vfr:
+            source = ['-f', 'matroska', '-i', 'pipe:0']
+        else:
+            source = ['-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}', '-r', str(fps), '-i', 'pipe:0']
+        command = [
+            'ffmpeg', '-y', '-loglevel', 'error', *source,
+            # yuv420p needs even dimensions
+            '-vf', 'crop=trunc(iw/2)*2:trunc(ih/2)*2',
+            '-c:v', 'libx264', '-preset', config.video.x264_preset, '-crf', str(crf or config.video.crf),
+            '-pix_fmt', 'yuv420p', '-g', str(self._keyframe_slots),
+            '-movflags', '+frag_keyframe+empty_moov+default_base_moof', '-flush_packets', '1',
+        ]
+        if config.video.x264_tune:
+            command += ['-tune', config.video.x264_tune]
+        if self.vfr:
+            # -g counts frames, which are sparse on static content: place keyframes by time instead
+            command += ffmpeg_vfr_args() + ['-force_key_frames', f'expr:gte(t,n_forced*{config.video.keyframe_seconds})']
+        command += ['-f', 'mp4', filename]
+
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                         stderr=subprocess.PIPE)
+        if self.vfr:
+            self._send(matroska_raw_header(frame_size, fps))
+
+    def isOpened(self) -> bool:
+        """Whether the encoder process is still accepting frames"""
+        return not self._failed and self._process.poll() is None
+
+    def write(self, frame: np.ndarray, count: int = 1, repeat: bool = False):
+        """
+        Send a BGR frame that stays on screen for count frame slots
+
+        repeat marks it as the frame already sent before; under VFR it is
+        then only re-sent when a keyframe interval has passed.
+        """
+        if self._failed:
+            return
+        data = memoryview(np.ascontiguousarray(frame)).cast('B')
+        if not self.vfr:
+            for _ in range(count):
+                self._send(data)
+            return
+
+        send_from = self._slot if not repeat or self._sent_slot is None else self._sent_slot + self._keyframe_slots
+        for slot in range(send_from, self._slot + count, self._keyframe_slots):
+            self._send_frame(data, slot)
+        self._slot += count
+        self._last_frame = data
+
+    def _send_frame(self, data: memoryview, slot: int):
+        self._send(matroska_frame_prefix(int(round(slot * 1e6 / self.fps)), len(data)))
+        self._send(data)
+        self._sent_slot = slot
+
+    def _send(self, data):
+        if self._failed:
+            return
+        try:
+            self._process.stdin.write(data)
+        except (BrokenPipeError, OSError) as e:
+            self._failed = True
+            logger.error(f"ffmpeg stopped accepting frames for {self.filename}: {e}")
+
+    def release(self):
+        """Finish the stream and wait for ffmpeg to flush the file"""
+        if self._process.stdin.closed:
+            return
+        if self.vfr and self._last_frame is not None and self._sent_slot < self._slot - 1:
+            self._send_frame(self._last_frame, self._slot - 1)
+        self._last_frame = None
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+        errors = self._process.stderr.read().decode(errors='replace').strip()
+        if self._process.wait() != 0:
+            logger.error(f"ffmpeg failed to encode {self.filename}: {errors}")
+
+def scaled_size(size: Tuple[int, int], scale: float) -> Tuple[int, int]:
+    """Output frame size for a capture size and scale factor, rounded to even dimensions"""
+    if scale >= 1.0:
+        return size
+    width, height = size
+    return (max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2))
+
+class FrameScaler:
+    """
+    Downscale captured frames into a caller's buffer through preallocated intermediates
+
+    cv2.INTER_AREA is only fast for exact 2x reductions, so frames are halved
+    with it as often as the target size allows and the remaining (< 2x) step
+    is bilinear, which at that ratio still reads every source pixel.
+    """
+    def __init__(self, source_size: Tuple[int, int], target_size: Tuple[int, int]):
+        self.target_size = target_size
+        self._halvings = []
+        width, height = source_size
+        while width // 2 >= target_size[0] and height // 2 >= target_size[1]:
+            width, height = width // 2, height // 2
+            self._halvings.append(np.empty((height, width, 3), dtype=np.uint8))
+        if self._halvings and (width, height) == target_size:
+            # The last halving lands on the target size and writes straight into the output
+            self._halvings[-1] = None
+
+    def scale(self, frame: np.ndarray, out: np.ndarray) -> np.ndarray:
+        """Write the downscaled frame into out"""
+        for buffer in self._halvings:
+            target = out if buffer is None else buffer
+            cv2.resize(frame, (target.shape[1], target.shape[0]), dst=target, interpolation=cv2.INTER_AREA)
+            frame = target
+        if frame is not out:
+            cv2.resize(frame, self.target_size, dst=out, interpolation=cv2.INTER_LINEAR)
+        return out
+
+def resolve_video_encoder(encoder: Optional[str] = None) -> str:
+    """Pick the configured video encoder, falling back to OpenCV when ffmpeg is unavailable"""
+    encoder = (encoder or config.video.encoder).lower()
+    if encoder == "ffmpeg" and not shutil.which('ffmpeg'):
+        logger.warning("ffmpeg not found - recording with OpenCV VideoWriter instead")
+        return "opencv"
+    return encoder if encoder in ("ffmpeg", "opencv") else "opencv"
+
+@dataclass
+class PacingStats:
+    """Frame timeline accounting for one recording"""
+    fps: float = 0.0
+    frames_grabbed: int = 0
+    frames_written: int = 0
+    late_frames: int = 0
+    dropped_frames: int = 0
+    duplicated_frames: int = 0
+    static_frames: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable snapshot including the resulting video duration"""
+        stats = asdict(self)
+        stats['duration_seconds'] = round(self.frames_written / self.fps, 3) if self.fps else 0.0
+        return stats
+
+class FramePacer:
+    """
+    Place frames on an exact fps timeline using absolute monotonic deadlines
+
+    Slot n of the output video covers [start + n / fps, start + (n + 1) / fps).
+    Waiting for absolute deadlines keeps grab and encode time from stretching
+    the frame period; slots that pass while the recorder is busy are filled
+    by repeating the previous frame, and frames whose slot is already written
+    are dropped, so frames_written / fps always matches wall-clock time.
+    """
+    def __init__(self, fps: float, start_time: Optional[float] = None):
+        self.fps = fps
+        self.start_time = time.monotonic() if start_time is None else start_time
+        self.next_slot = 0
+        self.stats = PacingStats(fps=fps)
+
+    def deadline(self) -> float:
+        """Monotonic time at which the next slot begins"""
+        return self.start_time + self.next_slot / self.fps
+
+    def wait(self, ahead: int = 0):
+        """Sleep until the deadline of the next slot, or of the slot `ahead` after it"""
+        remaining = self.deadline() + ahead / self.fps - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def place(self, captured_at: float, expected_gap: int = 0):
+        """
+        Assign a frame captured at the given monotonic time to a slot
+
+        Returns (repeats, keep): how many times the previous frame must be
+        written first to fill missed slots, and whether this frame is written.
+        Gaps up to expected_gap slots were skipped on purpose and are not
+        counted as late.
+        """
+        self.stats.frames_grabbed += 1
+        slot = int((captured_at - self.start_time) * self.fps)
+        if slot < self.next_slot:
+            self.stats.dropped_frames += 1
+            return 0, False
+
+        repeats = slot - self.next_slot
+        if repeats > expected_gap:
+            self.stats.late_frames += 1
+        if repeats:
+            self.stats.duplicated_frames += repeats
+        self.next_slot = slot + 1
+        self.stats.frames_written += repeats + 1
+        return repeats, True
+
+    def finish(self, stop_time: float) -> int:
+        """Number of repeats of the last frame needed for the timeline to end at stop_time"""
+        end_slot = int(round((stop_time - self.start_time) * self.fps))
+        repeats = max(0, end_slot - self.next_slot)
+        self.next_slot += repeats
+        self.stats.duplicated_frames += repeats
+        self.stats.frames_written += repeats
+        return repeats
+
 class VideoRecorder:
     """
     Screen video recorder implementation
@@ -21,7 +345,28 @@ class VideoRecorder:
         self.recording = False
         self.video_writer = None
         self.screen_thread = None
-        self.screen_size = pyautogui.size()
+        self.video_filename = None
+        self.video_size = None
+        self.capture_size = None
+        self.capture_region = None
+        self.scaler = None
+        self.proxy_filename = None
+        self.proxy_size = None
+        self.proxy_writer = None
+        self._proxy_scaler = None
+        self._proxy_frame = None
+        self._proxy_position = 0
+        self._proxy_frames = 0
+        self._proxy_stale = False
+        self.segment_files = []
+        self.frame_source = None
+        self.pacer = None
+        self.frame_pipeline = None
+        self.encoder = None
+        self.start_time = None
+        self.stop_time = None
+        self._frames_in_segment = 0
+        self.screen_size = get_screen_size()
         logger.info(f"Screen size detected: {self.screen_size}")
 
     def start_recording(self, output_filename: Optional[str] = None, region: Optional[Tuple[int, int, int, int]] = None):
@@ -34,43 +379,197 @@ class VideoRecorder:
 
         if region:
             x, y, width, height = region
-            video_size = (width, height)
         else:
             x, y = 0, 0
             width, height = self.screen_size
-            video_size = self.screen_size
+            if config.video.auto_roi:
+                x, y, width, height = self._calibrate_region((x, y, width, height))
+
+        self.encoder = resolve_video_encoder()
+        extension = "mp4" if self.encoder == "ffmpeg" else config.video.extension
+        video_filename = f"{output_filename}.{extension}"
+        self.video_filename = video_filename
+        self.capture_region = (x, y, width, height)
+        self.capture_size = (width, height)
+        self.video_size = scaled_size(self.capture_size, config.video.output_scale)
+        self.scaler = FrameScaler(self.capture_size, self.video_size) if self.video_size != self.capture_size else None
+        self.segment_files = []
+        self.frame_source = create_frame_source(self.capture_region)
+        self.start_time = None
+        self.stop_time = None
+
+        if config.segments.enabled:
+            self.video_writer = self._open_segment(0)
+        else:
+            self.video_writer = self._open_writer(video_filename)
 
-        fourcc = cv2.VideoWriter_fourcc(*config.video.codec)
-        video_filename = f"{output_filename}.{config.video.extension}"
-        self.video_writer = cv2.VideoWriter(video_filename, fourcc, config.video.fps, video_size)
+        self.proxy_filename = None
+        self.proxy_writer = None
+        if config.video.proxy_enabled:
+            self._open_proxy(f"{output_filename}_proxy.{extension}")
 
         logger.info(f"Starting screen recording to {video_filename}")
-        logger.info(f"Region: {'Full screen' if not region else f'{region}'}")
+        logger.info(f"Region: {'Full screen' if not region else f'{region}'} ({self.frame_source.name} capture)")
+        if self.video_size != self.capture_size:
+            logger.info(f"Scaling {self.capture_size[0]}x{self.capture_size[1]} -> "
+                        f"{self.video_size[0]}x{self.video_size[1]} before encoding")
 
         self.screen_thread = threading.Thread(target=self._record_screen, args=(region,))
         self.screen_thread.start()
 
         return output_filename
 
+    def _calibrate_region(self, region: Tuple[int, int, int, int]) -> Tuple[int, int, int, int]:
+        """Narrow the capture area to the part of the screen that changes during the first seconds"""
+        logger.info(f"Detecting active screen region for {config.video.auto_roi_seconds:.0f}s...")
+        source = create_frame_source(region)
+        try:
+            box = detect_active_region(source, config.video.auto_roi_seconds)
+        finally:
+            source.close()
+
+        if box is None:
+            logger.info("Whole screen is active - recording full screen")
+            return region
+        x, y, width, height = box
+        logger.info(f"Auto ROI: {width}x{height} at ({region[0] + x}, {region[1] + y})")
+        return (region[0] + x, region[1] + y, width, height)
+
+    def _grab_into(self, buffer: np.ndarray) -> np.ndarray:
+        """Grab a frame into a pooled buffer, downscaling it first if an output scale is set"""
+        if self.scaler is None:
+            return self.frame_source.grab(out=buffer)
+        return self.scaler.scale(self.frame_source.grab(), buffer)
+
+    def _open_writer(self, filename: str, fps: Optional[float] = None, frame_size: Optional[Tuple[int, int]] = None,
+                     crf: Optional[int] = None):
+        """Create a video writer, by default for the current recording size and rate"""
+        fps = fps or config.video.fps
+        frame_size = frame_size or self.video_size
+        if self.encoder == "ffmpeg":
+            writer = FFmpegVideoWriter(filename, fps, frame_size, crf=crf)
+        else:
+            writer = cv2.VideoWriter(filename, cv2.VideoWriter_fourcc(*config.video.codec), fps, frame_size)
+        if not writer.isOpened():
+            logger.error(f"Could not open video writer for {filename}")
+        return writer
+
+    def _open_proxy(self, filename: str):
+        """Create the low-resolution, low-fps review copy written by a second encoder worker"""
+        width, height = self.video_size
+        self.proxy_size = scaled_size(self.video_size, min(1.0, config.video.proxy_width / width))
+        self.proxy_filename = filename
+        self.proxy_writer = self._open_writer(filename, config.video.proxy_fps, self.proxy_size, crf=config.video.proxy_crf)
+        self._proxy_scaler = FrameScaler(self.video_size, self.proxy_size) if self.proxy_size != self.video_size else None
+        self._proxy_frame = np.empty((self.proxy_size[1], self.proxy_size[0], 3), dtype=np.uint8)
+        self._proxy_position = 0
+        self._proxy_frames = 0
+        self._proxy_stale = False
+        logger.info(f"Writing {self.proxy_size[0]}x{self.proxy_size[1]} @ {config.video.proxy_fps} fps proxy to {filename}")
+
+    def _write_proxy(self, frame, count: int = 1, repeat: bool = False):
+        """
+        Proxy encoder: subsample the main timeline to proxy_fps
+
+        Runs on its own encoder worker from the same pooled frames as the
+        master, so the proxy adds a downscale but no extra screen grab.
+        """
+        self._proxy_position += count
+        due = int(self._proxy_position * config.video.proxy_fps / config.video.fps) - self._proxy_frames
+        if due <= 0:
+            # A skipped new frame means the proxy's last frame is not the one being repeated
+            self._proxy_stale = self._proxy_stale or not repeat
+            return
+        scaled = self._proxy_scaler.scale(frame, self._proxy_frame) if self._proxy_scaler else frame
+        write_frames(self.proxy_writer, scaled, due, repeat and not self._proxy_stale)
+        self._proxy_stale = False
+        self._proxy_frames += due
+
+    def _open_segment(self, index: int):
+        """Create the writer for one rolling segment"""
+        base, ext = os.path.splitext(self.video_filename)
+        segment_file = f"{base}_seg{index:03d}{ext}"
+        self.segment_files.append(segment_file)
+        return self._open_writer(segment_file)
+
+    def _write_frame(self, frame, count: int = 1, repeat: bool = False):
+        """Append a frame covering count slots, rotating segments on exact frame counts"""
+        segment_frames = int(config.segments.segment_minutes * 60 * config.video.fps)
+        while count:
+            if config.segments.enabled and self._frames_in_segment >= segment_frames:
+                self.video_writer.release()
+                logger.info(f"Video segment closed: {self.segment_files[-1]}")
+                self.video_writer = self._open_segment(len(self.segment_files))
+                self._frames_in_segment = 0
+                # The new file has not seen the repeated frame yet
+                repeat = False
+
+            written = min(count, segment_frames - self._frames_in_segment) if config.segments.enabled else count
+            write_frames(self.video_writer, frame, written, repeat)
+            self._frames_in_segment += written
+            count -= written
+            repeat = True
+
     def _record_screen(self, region: Optional[Tuple[int, int, int, int]]):
-        """Screen recording thread function"""
+        """
+        Screen capture thread function
+
+        Frames are grabbed straight into pooled buffers and handed to the
+        encoder workers of a FramePipeline, so encoder stalls only reduce the
+        capture rate if the backpressure policy says so.
+        """
+        self._frames_in_segment = 0
+        width, height = self.video_size
+        self.pacer = FramePacer(config.video.fps)
+        self.start_time = self.pacer.start_time
+        encoders = [('main', self._write_frame)]
+        if self.proxy_writer:
+            encoders.append(('proxy', self._write_proxy))
+        self.frame_pipeline = FramePipeline((height, width, 3), encoders)
+        self.frame_pipeline.start()
+        detector = FrameChangeDetector() if config.video.static_detection else None
+        # Static frames are folded into repeats of the last submitted frame;
+        # they are flushed about once a second so the encoders keep pace
+        pending_repeats = 0
+        captured = False
+
         try:
             while self.recording:
-                if region:
-                    x, y, width, height = region
-                    screenshot = pyautogui.screenshot(region=(x, y, width, height))
-                else:
-                    screenshot = pyautogui.screenshot()
+                # Under the lower_fps policy only every capture_stride-th slot is grabbed
+                gap = self.frame_pipeline.capture_stride - 1
+                self.pacer.wait(ahead=gap)
+                if not self.recording:
+                    break
 
-                frame = np.array(screenshot)
-                frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+                repeats, keep = self.pacer.place(time.monotonic(), expected_gap=gap)
+                if not keep:
+                    continue
 
-                self.video_writer.write(frame)
-                time.sleep(1/config.video.fps)
+                index, buffer = self.frame_pipeline.acquire()
+                self._grab_into(buffer)
+
+                if detector and not detector.changed(buffer) and captured:
+                    self.frame_pipeline.discard(index)
+                    self.pacer.stats.static_frames += 1
+                    pending_repeats += repeats + 1
+                    if pending_repeats >= config.video.fps:
+                        self.frame_pipeline.repeat(pending_repeats)
+                        pending_repeats = 0
+                    continue
+
+                self.frame_pipeline.submit(index, pending_repeats + repeats)
+                pending_repeats = 0
+                captured = True
+
+            if captured:
+                self.frame_pipeline.repeat(pending_repeats + self.pacer.finish(self.stop_time or time.monotonic()))
 
         except Exception as e:
             logger.error(f"Screen recording error: {e}")
 
+        finally:
+            self.frame_pipeline.stop()
+
     def stop_recording(self) -> bool:
         """Stop screen recording"""
         if not self.recording:
@@ -78,6 +577,7 @@ class VideoRecorder:
             return False
 
         logger.info("Stopping screen recording...")
+        self.stop_time = time.monotonic()
         self.recording = False
 
         if self.screen_thread:
@@ -86,9 +586,42 @@ class VideoRecorder:
         if self.video_writer:
             self.video_writer.release()
 
+        if self.proxy_writer:
+            self.proxy_writer.release()
+
+        if self.frame_source:
+            self.frame_source.close()
+            logger.info(f"Frame grab latency: {self.frame_source.stats.to_dict()}")
+
+        if self.pacer:
+            stats = self.pacer.stats
+            logger.info(f"Video timeline: {stats.frames_written} frames ({stats.duplicated_frames} duplicated, "
+                        f"{stats.dropped_frames} dropped, {stats.late_frames} late)")
+
+        if self.frame_pipeline:
+            logger.info(f"Video encoding: {self.frame_pipeline.get_stats()}")
+
+        if self.segment_files:
+            concat_video_segments(self.segment_files, self.video_filename)
+
         logger.info("✅ Screen recording stopped successfully")
         return True
 
+    def get_capture_stats(self) -> Dict[str, Any]:
+        """Capture backend and per-frame grab latency of the current recording"""
+        if not self.frame_source:
+            return {}
+        stats = {'backend': self.frame_source.name, 'encoder': self.encoder,
+                 'capture_region': list(self.capture_region), 'output_size': list(self.video_size),
+                 'grab_latency': self.frame_source.stats.to_dict()}
+        if self.pacer:
+            stats['pacing'] = self.pacer.stats.to_dict()
+        if self.frame_pipeline:
+            stats['encoding'] = self.frame_pipeline.get_stats()
+        if self.proxy_filename:
+            stats['proxy'] = {'fps': config.video.proxy_fps, 'size': list(self.proxy_size), 'frames': self._proxy_frames}
+        return stats
+
     def get_screen_region_interactively(self) -> Tuple[int, int, int, int]:
         """Get screen region from user input"""
         print("\nTo select a region:")
@@ -115,4 +648,4 @@ if __name__ == "__main__":
         pass
     finally:
         recorder.stop_recording()
-        logger.info(f"Video recorded: {output_file}.{config.video.extension}")
+        logger.info(f"Video recorded: {recorder.video_filename}")
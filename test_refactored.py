@@ -112,6 +112,337 @@ def test_session_manager():
     
     print("✅ Session manager tested successfully")
 
+def test_streaming_writer():
+    """Test ring buffer and incremental WAV writing"""
+    print("\nTesting streaming audio writer...")
+    
+    import tempfile
+    import wave
+    from src.audio_io import RingBuffer, WavStreamWriter, CaptureWriter
+    
+    ring = RingBuffer(8)
+    ring.write(b'abcdef')
+    ring.read(4)
+    ring.write(b'ghij')
+    if ring.read(100) == b'efghij' and not ring.write(b'x' * 9):
+        print("✅ Ring buffer wraps and drops oversized chunks")
+    else:
+        print("❌ Ring buffer returned unexpected data")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'stem.wav')
+        writer = CaptureWriter('test', 256 * 1024, [WavStreamWriter(path, 2, 44100)], frame_bytes=4)
+        writer.start()
+        for _ in range(100):
+            writer.push(b'\x01\x00' * 512)
+        writer.stop()
+        
+        with wave.open(path, 'rb') as wf:
+            print(f"✅ Streamed WAV: {wf.getnframes()} frames, {wf.getnchannels()} channels")
+    
+    read_size = CaptureWriter('odd', 1024, [], frame_bytes=6).read_size
+    if read_size % 6 == 0:
+        print(f"✅ Ring reads aligned to 6-byte frames ({read_size} bytes)")
+    else:
+        print(f"❌ Ring read size {read_size} splits 6-byte frames")
+
+def test_capture_alignment():
+    """Test capture clock fitting, source alignment and drift-corrected rendering"""
+    print("\nTesting capture clock alignment...")
+    
+    import numpy as np
+    from src.audio_processing import fit_capture_clock, estimate_alignment, _render_source_block
+    
+    rng = np.random.default_rng(0)
+    frames = np.arange(0, 48000 * 60, 1024)
+    period = (1 + 50e-6) / 48000
+    times = 5.0 + period * frames + rng.exponential(0.002, len(frames))
+    t0, fitted = fit_capture_clock(frames, times)
+    drift_ppm = (fitted * 48000 - 1) * 1e6
+    if abs(t0 - 5.0) < 0.001 and abs(drift_ppm - 50) < 5:
+        print(f"✅ Clock fit despite jitter: start {t0:.4f}s, drift {drift_ppm:+.1f} ppm")
+    else:
+        print(f"❌ Clock fit off: start {t0:.4f}s, drift {drift_ppm:+.1f} ppm")
+    
+    alignment = estimate_alignment({'system': (10.0, 1 / 48000), 'mic': (10.1, period)}, reference='system')
+    mic_offset, mic_ratio = alignment['mic']
+    if (alignment['system'] == (0.0, 1.0) and abs(mic_offset + 0.1 / period) < 1e-6
+            and abs(mic_ratio - 1 / (1 + 50e-6)) < 1e-12):
+        print(f"✅ Later mic aligned: offset {mic_offset:.1f} frames, ratio {mic_ratio:.8f}")
+    else:
+        print(f"❌ Unexpected alignment: {alignment}")
+    
+    ramp = np.arange(100, dtype=np.float32)[:, None]
+    shifted = _render_source_block(ramp, -3.0, 1.0, 0, 6)[:, 0]
+    interpolated = _render_source_block(ramp, 2.5, 1.0, 10, 3)[:, 0]
+    stretched = _render_source_block(ramp, 0.0, 2.0, 48, 4)[:, 0]
+    if (shifted.tolist() == [0, 0, 0, 0, 1, 2] and interpolated.tolist() == [12.5, 13.5, 14.5]
+            and stretched.tolist() == [96, 98, 0, 0]):
+        print("✅ Source blocks padded, interpolated and cut at the source end")
+    else:
+        print(f"❌ Unexpected source blocks: {shifted}, {interpolated}, {stretched}")
+
+def test_resampler():
+    """Test streaming polyphase resampling: length, DC gain and block independence"""
+    print("\nTesting polyphase resampler...")
+    
+    import numpy as np
+    from src.audio_processing import PolyphaseResampler
+    
+    signal = np.random.default_rng(0).standard_normal(44100).astype(np.float32)
+    whole = PolyphaseResampler(44100, 16000)
+    expected = np.concatenate([whole.process(signal), whole.flush()])
+    streamed = PolyphaseResampler(44100, 16000)
+    blocks = [streamed.process(block) for block in np.split(signal, [1, 500, 4096, 30000])]
+    streamed_output = np.concatenate(blocks + [streamed.flush()])
+    if len(expected) == 16000 and np.allclose(streamed_output, expected, atol=1e-5):
+        print(f"✅ 44.1 kHz -> 16 kHz: {len(expected)} samples, identical when streamed in uneven blocks")
+    else:
+        print(f"❌ Resampled {len(expected)} samples (streamed {len(streamed_output)})")
+    
+    dc = PolyphaseResampler(48000, 16000)
+    output = np.concatenate([dc.process(np.full(48000, 0.5, dtype=np.float32)), dc.flush()])
+    gain = float(output[1000:-1000].mean()) / 0.5
+    if len(output) == 16000 and abs(gain - 1.0) < 1e-3:
+        print(f"✅ 48 kHz -> 16 kHz keeps unit DC gain ({gain:.5f})")
+    else:
+        print(f"❌ DC gain {gain:.5f} over {len(output)} samples")
+
+def test_segment_mixing():
+    """Test that per-segment mixes of offset sources join into the full mix"""
+    print("\nTesting segmented mixing...")
+    
+    import tempfile
+    import numpy as np
+    from src.audio_io import WavStreamWriter, open_wav_memmap
+    from src.audio_processing import mix_wav_files
+    
+    segment_frames = 1000
+    rng = np.random.default_rng(0)
+    streams = {'system': rng.integers(-3000, 3000, (2500, 1)).astype('<i2'),
+               'mic': rng.integers(-3000, 3000, (2350, 1)).astype('<i2')}
+    alignments = [(0.0, 1.0), (-300.0, 1.0)]  # mic started 300 frames later
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        def write(name, samples):
+            path = os.path.join(temp_dir, name)
+            writer = WavStreamWriter(path, 1, 48000)
+            writer.write(samples.tobytes())
+            writer.close()
+            return path
+        
+        full = [(write(f"{source}.wav", samples), 1.0) for source, samples in streams.items()]
+        segmented = [([write(f"{source}_{start}.wav", samples[start:start + segment_frames])
+                       for start in range(0, len(samples), segment_frames)], 1.0)
+                     for source, samples in streams.items()]
+        
+        mix_wav_files(full, os.path.join(temp_dir, "full_mix.wav"), alignments=alignments)
+        reference = open_wav_memmap(os.path.join(temp_dir, "full_mix.wav"))[0]
+        
+        parts = []
+        for index in range(3):
+            path = os.path.join(temp_dir, f"mix_{index}.wav")
+            end = None if index == 2 else (index + 1) * segment_frames
+            mix_wav_files(segmented, path, alignments=alignments, frame_range=(index * segment_frames, end))
+            parts.append(np.array(open_wav_memmap(path)[0]))
+        joined = np.concatenate(parts)
+    
+    lengths = [len(part) for part in parts]
+    if lengths[:2] == [segment_frames] * 2 and len(joined) == 2650 and np.array_equal(joined, reference):
+        print(f"✅ Segments of {lengths} frames join into the aligned full mix")
+    else:
+        print(f"❌ Segmented mix differs from the full mix (segments {lengths})")
+
+def test_chunk_stitching():
+    """Test silence-aligned chunk planning and overlap removal when stitching"""
+    print("\nTesting chunked transcription helpers...")
+    
+    from src.transcription import plan_chunks, stitch_chunks
+    
+    regions = [(0.0, 290.0), (296.0, 610.0), (620.0, 1000.0)]
+    chunks = plan_chunks(1000.0, regions, chunk_seconds=300.0, overlap_seconds=2.0)
+    expected = [(0.0, 295.0, 0.0, 293.0), (291.0, 617.0, 293.0, 615.0), (613.0, 1000.0, 615.0, 1000.0)]
+    if chunks == expected:
+        print(f"✅ Chunks cut in silences: {[(keep_from, keep_to) for _, _, keep_from, keep_to in chunks]}")
+    else:
+        print(f"❌ Unexpected chunk plan: {chunks}")
+    
+    cuts = [chunk[2] for chunk in plan_chunks(1000.0, [], chunk_seconds=300.0, overlap_seconds=2.0)]
+    if cuts == [0.0, 300.0, 600.0]:
+        print("✅ Without silences chunks are cut at the nominal length")
+    else:
+        print(f"❌ Unexpected cuts without silences: {cuts}")
+    
+    stitched = stitch_chunks([
+        (0.0, 10.0, [{'start': 0.0, 'end': 9.5, 'text': ' hello world'}]),
+        (10.0, 20.0, [{'start': 9.0, 'end': 12.0, 'text': ' \u2014 Hello, world. And more'}]),
+        (20.0, 30.0, [{'start': 10.0, 'end': 11.0, 'text': ' stale'},
+                      {'start': 19.5, 'end': 22.0, 'text': ' More! Then',
+                       'words': [{'word': ' More!', 'start': 19.5, 'end': 19.9},
+                                 {'word': ' Then', 'start': 20.2, 'end': 20.5}]}]),
+    ])
+    texts = [segment['text'] for segment in stitched]
+    if texts == [' hello world', ' And more', ' Then'] and stitched[-1]['start'] == 20.2:
+        print("✅ Repeated words at chunk joins removed (including single words and leading punctuation)")
+    else:
+        print(f"❌ Unexpected stitched segments: {texts}")
+
+def test_live_alignment():
+    """Test live tap placement by capture time and bypassing a stalled source"""
+    print("\nTesting live transcription buffer...")
+    
+    import numpy as np
+    from src.audio_io import TimingTrack
+    from src.live_transcription import LiveAudioBuffer, LiveTapSink
+    
+    def feed(sink, timing, start_time, level, seconds, rate=48000, chunk=4800):
+        block = np.full(chunk, int(level * 32767), dtype=np.int16).tobytes()
+        for index in range(int(seconds * rate / chunk)):
+            timing.record(chunk, start_time + index * chunk / rate)
+            sink.write(block)
+    
+    buffer = LiveAudioBuffer(stall_seconds=5.0)
+    system_timing, mic_timing = TimingTrack(), TimingTrack()
+    system = LiveTapSink(buffer, 'system', 1, 48000, system_timing)
+    mic = LiveTapSink(buffer, 'mic', 1, 48000, mic_timing)
+    feed(system, system_timing, 100.0, 0.25, 3.0)
+    feed(mic, mic_timing, 100.5, 0.5, 2.5)
+    mix = buffer.read(0, buffer.available())
+    mic_start = int(np.argmax(mix > 0.5))
+    if abs(mic_start - 8000) <= 400:
+        print(f"✅ Later source placed at its capture time ({mic_start / 16000:.3f}s)")
+    else:
+        print(f"❌ Later source placed at {mic_start / 16000:.3f}s instead of 0.5s")
+    
+    buffer = LiveAudioBuffer(stall_seconds=5.0)
+    timing = TimingTrack()
+    system = LiveTapSink(buffer, 'system', 1, 48000, timing)
+    buffer.add_source('mic')
+    feed(system, timing, 0.0, 0.25, 3.0)
+    waiting = buffer.available()
+    feed(system, timing, 3.0, 0.25, 5.0)
+    if waiting == 0 and buffer.available() > 7 * 16000:
+        print("✅ Silent source bypassed once it stalls")
+    else:
+        print(f"❌ Mix stalled: {waiting} then {buffer.available()} samples available")
+
+def test_transcript_cache():
+    """Test transcript cache keys, LRU eviction and memoized file hashes"""
+    print("\nTesting transcript cache...")
+    
+    import tempfile
+    import time
+    import src.transcript_cache as transcript_cache
+    from src.config import config
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = transcript_cache.TranscriptCache(os.path.join(temp_dir, "cache.sqlite"), max_mb=0.01)
+        
+        base = cache.key("abc", model="base", language="en", task="transcribe")
+        variants = {cache.key("abd", model="base", language="en", task="transcribe"),
+                    cache.key("abc", model="small", language="en", task="transcribe"),
+                    cache.key("abc", model="base", language="de", task="transcribe"),
+                    cache.key("abc", model="base", language="en", task="translate"),
+                    cache.key("abc", model="base", language="en", task="transcribe", initial_prompt="Agenda")}
+        vad_enabled = config.whisper.vad_enabled
+        config.whisper.vad_enabled = not vad_enabled
+        variants.add(cache.key("abc", model="base", language="en", task="transcribe"))
+        config.whisper.vad_enabled = vad_enabled
+        if base == cache.key("abc", model="base", language="en", task="transcribe") and base not in variants \
+                and len(variants) == 6:
+            print("✅ Cache key changes with audio, model, language, task, prompt and VAD")
+        else:
+            print("❌ Cache keys collide")
+        
+        # Incompressible results of ~4 KB each: only two fit in 10 KB
+        results = {name: {'text': os.urandom(4000).hex()} for name in ("first", "second", "third")}
+        cache.put("first", cache.key_inputs("h1"), results["first"])
+        time.sleep(0.01)
+        cache.put("second", cache.key_inputs("h2"), results["second"])
+        time.sleep(0.01)
+        cache.get("first")
+        time.sleep(0.01)
+        cache.put("third", cache.key_inputs("h3"), results["third"])
+        kept = [name for name in results if cache.get(name) == results[name]]
+        if kept == ["first", "third"]:
+            print(f"✅ Least recently used entry evicted ({cache.get_stats()['entries']} kept)")
+        else:
+            print(f"❌ Unexpected entries after eviction: {kept}")
+        
+        audio_file = os.path.join(temp_dir, "audio.wav")
+        with open(audio_file, 'wb') as f:
+            f.write(b'\x01' * 1000)
+        calls = []
+        original_hash_file = transcript_cache.hash_file
+        transcript_cache.hash_file = lambda path: calls.append(path) or original_hash_file(path)
+        try:
+            first = cache.audio_hash(audio_file)
+            repeated = cache.audio_hash(audio_file)
+            with open(audio_file, 'wb') as f:
+                f.write(b'\x02' * 1001)
+            changed = cache.audio_hash(audio_file)
+        finally:
+            transcript_cache.hash_file = original_hash_file
+        if first == repeated and changed != first and len(calls) == 2:
+            print("✅ File hashes memoized until the file changes")
+        else:
+            print(f"❌ File hashed {len(calls)} times")
+
+def test_segment_export():
+    """Test subtitle timestamps and saving and loading timed segments"""
+    print("\nTesting segment export...")
+    
+    import json
+    import tempfile
+    from src.segments import format_subtitle_timestamp, export_segments, load_segments
+    
+    stamps = [format_subtitle_timestamp(3723.4567), format_subtitle_timestamp(59.9996, '.'),
+              format_subtitle_timestamp(-1.0)]
+    if stamps == ["01:02:03,457", "00:01:00.000", "00:00:00,000"]:
+        print(f"✅ Subtitle timestamps: {stamps}")
+    else:
+        print(f"❌ Unexpected subtitle timestamps: {stamps}")
+    
+    segments = [{'start': 0.0, 'end': 1.5, 'text': ' Hello there.', 'speaker': 'Me'},
+                {'start': 1.5, 'end': 2.0, 'text': '  '},
+                {'start': 2.0, 'end': 4.25, 'text': ' General Kenobi.'}]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        files = export_segments(segments, temp_dir, language='en')
+        with open(files.get('subtitles_srt', os.devnull), 'r', encoding='utf-8') as f:
+            srt = f.read()
+        with open(os.path.join(temp_dir, "session_info.json"), 'w', encoding='utf-8') as f:
+            json.dump({'files': {'segments': os.path.basename(files.get('segments', ''))}}, f)
+        from_session = load_segments(temp_dir)
+        from_file = load_segments(files.get('segments', temp_dir))
+        missing = load_segments(os.path.join(temp_dir, "missing.json"))
+    
+    if srt.startswith("1\n00:00:00,000 --> 00:00:01,500\nMe: Hello there.\n\n2\n00:00:02,000"):
+        print(f"✅ Exported {', '.join(sorted(files))} without blank segments")
+    else:
+        print(f"❌ Unexpected SRT output: {srt[:80]!r}")
+    if [segment['text'] for segment in from_session] == ["Hello there.", "General Kenobi."] \
+            and from_file == from_session and missing == []:
+        print(f"✅ Loaded {len(from_session)} segments from the session directory and the file")
+    else:
+        print(f"❌ Unexpected loaded segments: {from_session}")
+
+def test_frame_sources():
+    """Test the headless synthetic frame source"""
+    print("\nTesting frame sources...")
+    
+    from src.frame_sources import create_frame_source
+    
+    source = create_frame_source((0, 0, 320, 240), backend="synthetic")
+    first = source.grab().copy()
+    second = source.grab()
+    stats = source.stats.to_dict()
+    source.close()
+    
+    if second.shape == (240, 320, 3) and (first != second).any() and stats['frames'] == 2:
+        print(f"✅ Synthetic frames captured ({stats['mean_ms']} ms per grab)")
+    else:
+        print("❌ Synthetic frame source returned unexpected frames")
+
 def test_audio_devices():
     """Test audio device detection"""
     print("\nTesting audio device detection...")
@@ -162,6 +493,15 @@ def main():
     test_config()
     test_utils()
     test_session_manager()
+    test_streaming_writer()
+    test_capture_alignment()
+    test_resampler()
+    test_segment_mixing()
+    test_chunk_stitching()
+    test_live_alignment()
+    test_transcript_cache()
+    test_segment_export()
+    test_frame_sources()
     test_audio_devices()
     test_ollama_connection()
     